@@ -0,0 +1,66 @@
+"""
+How long the event loop is blocked while a large table is rendered inside
+it. A ticker task measures the longest gap between its wake-ups while the
+table is rendered with `columnar()`, with `render_async()` planning on the
+loop's default executor and yielding between chunks, and with
+`render_async()` rendering on a thread pool.
+
+    PYTHONPATH=. python benchmarks/async_latency.py
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from columnar import columnar
+
+NUM_ROWS = 50_000
+HEADERS = ["name", "id", "host", "description"]
+DATA = [
+    ["busybox", f"c3c37d5d-38d2-409f-8d02-{row:012}", f"linuxnode-{row % 50}", "Test server."]
+    for row in range(NUM_ROWS)
+]
+
+
+async def longest_stall(render):
+    gaps = []
+    done = asyncio.Event()
+
+    async def ticker():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await render()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await task
+    return elapsed, max(gaps)
+
+
+async def blocking():
+    columnar(DATA, HEADERS, terminal_width=200)
+
+
+async def chunked():
+    await columnar.render_async(DATA, HEADERS, terminal_width=200)
+
+
+async def threaded():
+    with ThreadPoolExecutor(1) as executor:
+        await columnar.render_async(DATA, HEADERS, executor=executor, terminal_width=200)
+
+
+async def main():
+    for render in (blocking, chunked, threaded):
+        elapsed, stall = await longest_stall(render)
+        print(f"{render.__name__:>9}: {elapsed:.3f}s total, event loop blocked for up to {stall * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
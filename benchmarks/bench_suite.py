@@ -0,0 +1,22 @@
+"""
+The cases from `benchmarks/suite.py` as pytest-benchmark benchmarks, timing
+`Columnar.render` as a whole. `python -m pytest` puts the root of the
+checkout on the path. pytest-benchmark keeps its own baselines:
+
+    python -m pytest benchmarks/bench_suite.py --benchmark-autosave
+    python -m pytest benchmarks/bench_suite.py --benchmark-compare --benchmark-compare-fail=mean:25%
+"""
+import pytest
+
+from columnar import Columnar
+
+from suite import CASES, make_table
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_render(benchmark, case):
+    renderer = Columnar(**case.options())
+    data, headers = make_table(case)
+    benchmark(renderer.render, data, headers)
@@ -0,0 +1,31 @@
+"""
+Rendering a table whose columns repeat a handful of values, with and without
+a `CellCache`.
+
+    PYTHONPATH=. python benchmarks/cell_cache.py
+"""
+import time
+
+from columnar import CellCache, Columnar
+
+NUM_ROWS = 100_000
+STATUSES = ["\x1b[32mrunning\x1b[0m", "\x1b[31mstopped\x1b[0m", "\x1b[33mpending\x1b[0m"]
+REGIONS = ["us-east-1", "us-west-2", "eu-central-1", "ap-northeast-1"]
+DATA = [
+    [STATUSES[i % 3], REGIONS[i % 4], f"linuxnode-{i % 50}", "本日のヒーロー"]
+    for i in range(NUM_ROWS)
+]
+HEADERS = ["status", "region", "host", "note"]
+OPTIONS = dict(terminal_width=80, patterns=[(r"linuxnode-[0-9]$", str.upper)])
+
+
+if __name__ == "__main__":
+    renderer = Columnar(**OPTIONS)
+    start = time.perf_counter()
+    renderer.render(DATA, HEADERS)
+    print(f"{'no cache':>10}: {time.perf_counter() - start:.3f}s")
+    cache = CellCache(maxsize=1024)
+    start = time.perf_counter()
+    renderer.render(DATA, HEADERS, cell_cache=cache)
+    print(f"{'cache':>10}: {time.perf_counter() - start:.3f}s  {cache.cache_info()}")
+    print(f"{'hit rate':>10}: {cache.cache_info().hit_rate:.2%}")
@@ -0,0 +1,34 @@
+"""
+Throughput of rendering a colorized log table, where every row goes through
+the user's patterns and most cells carry ANSI color codes.
+
+    PYTHONPATH=. python benchmarks/colorized_logs.py
+"""
+import time
+
+from columnar import Columnar
+
+NUM_ROWS = 20_000
+LEVELS = ["\x1b[32mINFO\x1b[0m", "\x1b[33mWARN\x1b[0m", "\x1b[1m\x1b[31mERROR\x1b[0m"]
+DATA = [
+    [f"2021-12-27 10:{i // 60 % 60:02}:{i % 60:02}", LEVELS[i % 3], f"worker-{i % 8}", f"request {i} handled"]
+    for i in range(NUM_ROWS)
+]
+HEADERS = ["time", "level", "source", "message"]
+OPTIONS = dict(
+    terminal_width=120,
+    patterns=[
+        (r"worker-[0-3]$", str.upper),
+        (r"request \d+ handled", lambda text: text.replace("handled", "\x1b[2mhandled\x1b[0m")),
+        (r"worker-[4-7]$", str.title),
+    ],
+)
+
+
+if __name__ == "__main__":
+    for name, options in {"colors": {"terminal_width": 120}, "colors+patterns": OPTIONS}.items():
+        renderer = Columnar(**options)
+        start = time.perf_counter()
+        renderer.render(DATA, HEADERS)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>16}: {NUM_ROWS / elapsed:>10.0f} rows/sec")
@@ -0,0 +1,37 @@
+"""
+Measures how planning column widths, Columnar.natural_column_widths followed
+by Columnar.get_column_widths, scales with the number of rows.
+
+The time per row should stay roughly constant from 1k to 1M rows; a
+quadratic implementation shows up as a per-row cost that grows with
+the size of the table.
+
+    PYTHONPATH=. python benchmarks/column_widths.py
+"""
+import time
+
+from columnar import Columnar
+from columnar.columnar import ColumnData
+from columnar.width import display_width
+
+ROW_COUNTS = [1_000, 10_000, 100_000, 1_000_000]
+ROW = ["busybox", "c3c37d5d-38d2-409f-8d02-600fd9d51239", "linuxnode-1-292735", "Test server."]
+
+
+def time_column_widths(num_rows):
+    renderer = Columnar()
+    column_data = ColumnData(
+        [[[cell]] * num_rows for cell in ROW],
+        [[None] * num_rows for _ in ROW],
+        [[[display_width(cell)]] * num_rows for cell in ROW],
+    )
+    start = time.perf_counter()
+    renderer.get_column_widths(renderer.natural_column_widths(column_data), 200)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print(f"{'rows':>10} {'seconds':>10} {'us/row':>10}")
+    for num_rows in ROW_COUNTS:
+        elapsed = time_column_widths(num_rows)
+        print(f"{num_rows:>10} {elapsed:>10.4f} {elapsed / num_rows * 1e6:>10.3f}")
@@ -0,0 +1,40 @@
+"""
+Rendering a pandas DataFrame directly, which converts and measures whole
+columns at once, against converting it to a list of lists first.
+
+    PYTHONPATH=. python benchmarks/dataframes.py
+"""
+import time
+
+import numpy
+import pandas
+
+from columnar import columnar
+
+NUM_ROWS = 100_000
+
+
+def make_frame(num_rows):
+    rng = numpy.random.default_rng(0)
+    return pandas.DataFrame(
+        {
+            "id": numpy.arange(num_rows),
+            "status": rng.choice(["running", "stopped", "pending"], num_rows),
+            "host": [f"linuxnode-{i % 50}" for i in range(num_rows)],
+            "load": rng.random(num_rows).round(3),
+        }
+    )
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    frame = make_frame(NUM_ROWS)
+    headers = list(frame.columns)
+    as_lists = timed(lambda: columnar(frame.values.tolist(), headers, terminal_width=120))
+    as_frame = timed(lambda: columnar(frame, terminal_width=120))
+    print(f"{NUM_ROWS} rows: list of lists {as_lists:.2f}s, DataFrame {as_frame:.2f}s")
@@ -0,0 +1,61 @@
+"""
+Compares the original wrapping loop, which re-measures shrinking slices of a
+line with wcswidth, against columnar.width.wrap_line on long cells of ASCII,
+CJK and emoji text.
+
+    PYTHONPATH=. python benchmarks/display_width.py
+"""
+import time
+
+from wcwidth import wcswidth
+
+from columnar.width import display_width, wrap_line
+
+CELLS = {
+    "ascii": "The quick brown fox jumps over the lazy dog. " * 40,
+    "cjk": "本日のヒーロー周東選手、侍ジャパンのプレミア12優勝に貢献。" * 40,
+    "emoji": "Fried Dumplings!!!! Yum! 😍😍😍 🦸✨🍑 " * 40,
+}
+WIDTH = 30
+REPEAT = 20
+
+
+def legacy_wrap(line, width):
+    out = []
+    while wcswidth(line) > width:
+        wrap_index = width
+        while wcswidth(line[:wrap_index]) > width:
+            wrap_index -= 1
+        out.append(line[:wrap_index])
+        line = line[wrap_index:]
+    out.append(line)
+    return out
+
+
+def best_of(func, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    print(f"{'cell':>8} {'chars':>7} {'legacy ms':>10} {'wrap_line ms':>13} {'speedup':>8}")
+    for name, cell in CELLS.items():
+        assert legacy_wrap(cell, WIDTH) == wrap_line(cell, WIDTH)
+        legacy = best_of(legacy_wrap, cell, WIDTH)
+        fast = best_of(wrap_line, cell, WIDTH)
+        print(f"{name:>8} {len(cell):>7} {legacy * 1e3:>10.3f} {fast * 1e3:>13.3f} {legacy / fast:>7.1f}x")
+
+    statuses = ["正常", "警告", "エラー", "ok"] * 25_000
+    start = time.perf_counter()
+    for status in statuses:
+        wcswidth(status)
+    uncached = time.perf_counter() - start
+    start = time.perf_counter()
+    for status in statuses:
+        display_width(status)
+    cached = time.perf_counter() - start
+    print(f"\n{len(statuses)} repeated status cells: wcswidth {uncached * 1e3:.1f} ms, display_width {cached * 1e3:.1f} ms")
@@ -0,0 +1,24 @@
+"""
+Rendering a wide table where most of the columns are dropped because they
+only hold placeholder values, the case `drop` is meant for.
+
+    PYTHONPATH=. python benchmarks/drop_columns.py
+"""
+import time
+
+from columnar import columnar
+
+NUM_ROWS = 20_000
+NUM_COLUMNS = 40
+NUM_DROPPED = 30
+HEADERS = [f"column{i}" for i in range(NUM_COLUMNS)]
+DATA = [
+    [None] * NUM_DROPPED + [f"value {row}-{i}" for i in range(NUM_COLUMNS - NUM_DROPPED)]
+    for row in range(NUM_ROWS)
+]
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    columnar(DATA, HEADERS, drop=["None"], terminal_width=400)
+    print(f"{NUM_ROWS} rows, {NUM_DROPPED} of {NUM_COLUMNS} columns dropped: {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,60 @@
+"""
+Measures the emission stage on 100k-row tables: wrapping, justifying and
+joining rows into lines once their cells have been converted and their
+column widths planned. Tables are timed with and without borders and with
+left, center and mixed justification. A SHA-256 of each table is printed
+alongside its time so that the output of two versions can be checked to be
+byte for byte the same.
+
+    PYTHONPATH=. python benchmarks/emit_rows.py
+"""
+import hashlib
+import time
+
+from columnar import Columnar
+
+NUM_ROWS = 100_000
+HEADERS = ["name", "id", "host", "status", "description"]
+DATA = [
+    [
+        f"container-{row}",
+        f"c3c37d5d-38d2-409f-8d02-{row:012}",
+        f"linuxnode-{row % 50}",
+        ("running", "stopped", "restarting")[row % 3],
+        "Test server." if row % 7 else "Test server with a longer description that wraps.",
+    ]
+    for row in range(NUM_ROWS)
+]
+CONFIGURATIONS = {
+    "borders": {},
+    "no borders": {"no_borders": True},
+    "centered": {"justify": "c"},
+    "mixed": {"justify": ["l", "r", "c", "l", "r"]},
+}
+
+
+def time_emission(options, repeat=5):
+    renderer = Columnar(terminal_width=120, max_column_width=30, **options)
+    column_data = renderer.convert_data_to_logical_rows(renderer.clean_data(DATA))
+    column_widths = renderer.get_column_widths(
+        renderer.natural_column_widths(column_data), renderer.terminal_width
+    )
+    justifications = renderer.justifications_for(len(HEADERS))
+    rows = list(column_data.logical_rows())
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lines = list(
+            renderer.render_table(
+                None, rows, column_widths, justifications, renderer.justify, None
+            )
+        )
+        timings.append(time.perf_counter() - start)
+    table = "".join(lines).encode("utf-8")
+    return min(timings), hashlib.sha256(table).hexdigest()[:16]
+
+
+if __name__ == "__main__":
+    for name, options in CONFIGURATIONS.items():
+        elapsed, digest = time_emission(options)
+        print(f"{name:>12}: {elapsed:.3f}s  sha256 {digest}")
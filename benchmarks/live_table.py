@@ -0,0 +1,42 @@
+"""
+Refreshing a dashboard where a few cells change every frame, rendered from
+scratch with `columnar()` and incrementally with a `LiveTable`.
+
+    PYTHONPATH=. python benchmarks/live_table.py
+"""
+import random
+import time
+
+from columnar import LiveTable, columnar
+
+NUM_ROWS = 2_000
+NUM_FRAMES = 20
+CHANGES_PER_FRAME = 10
+HEADERS = ["pid", "user", "cpu", "mem", "command"]
+OPTIONS = dict(terminal_width=120)
+
+
+def frames():
+    rng = random.Random(0)
+    data = [
+        [str(pid), "root", "0.0", "0.1", f"/usr/bin/worker --id {pid}"]
+        for pid in range(NUM_ROWS)
+    ]
+    for _ in range(NUM_FRAMES):
+        for _ in range(CHANGES_PER_FRAME):
+            data[rng.randrange(NUM_ROWS)][2] = f"{rng.random() * 10:.1f}"
+        yield [list(row) for row in data]
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    for data in frames():
+        columnar(data, HEADERS, **OPTIONS)
+    full = (time.perf_counter() - start) / NUM_FRAMES
+    live = LiveTable(HEADERS, **OPTIONS)
+    start = time.perf_counter()
+    for data in frames():
+        live.update(data)
+    incremental = (time.perf_counter() - start) / NUM_FRAMES
+    print(f"{'columnar()':>12}: {full * 1000:>8.2f} ms/frame")
+    print(f"{'LiveTable':>12}: {incremental * 1000:>8.2f} ms/frame")
@@ -0,0 +1,48 @@
+"""
+Compares the peak memory of writing a large table to a pipe by encoding the
+string returned by `columnar()` with writing it through `render_to()`, which
+encodes and writes it in fixed-size chunks. Column widths are planned from a
+sample so that rows are streamed through rather than all laid out up front.
+
+    PYTHONPATH=. python benchmarks/render_to.py
+"""
+import os
+import time
+import tracemalloc
+
+from columnar import columnar
+
+NUM_ROWS = 100_000
+HEADERS = ["name", "id", "host", "description"]
+DATA = [
+    ["busybox", f"c3c37d5d-38d2-409f-8d02-{row:012}", f"linuxnode-{row % 50}", "Test server."]
+    for row in range(NUM_ROWS)
+]
+
+
+def encode_whole_table(fd):
+    os.write(fd, columnar(DATA, HEADERS, terminal_width=200, sample_size=1000).encode("utf-8"))
+
+
+def write_in_chunks(fd):
+    columnar.render_to(fd, DATA, HEADERS, terminal_width=200, sample_size=1000)
+
+
+def measure(write):
+    fd = os.open(os.devnull, os.O_WRONLY)
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        write(fd)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        os.close(fd)
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    for write in (encode_whole_table, write_in_chunks):
+        elapsed, peak = measure(write)
+        print(f"{write.__name__:>20}: {elapsed:.3f}s, peak {peak / 2**20:.1f} MiB")
@@ -0,0 +1,52 @@
+"""
+Throughput of rendering many small tables with the same settings.
+
+"rebuilt" constructs a new renderer for every table, which is what every
+call to `columnar(...)` with options used to cost. "configured" reuses one
+renderer through `render()`, and "columnar()" goes through the module level
+instance, which reuses cached renderers for repeated options.
+
+    PYTHONPATH=. python benchmarks/small_tables.py
+"""
+import time
+
+from columnar import Columnar, columnar
+
+HEADERS = ["name", "status", "host"]
+DATA = [
+    ["busybox", "running", "linuxnode-1"],
+    ["alpine-python", "stopped", "linuxnode-2"],
+    ["redis", "running", "linuxnode-3"],
+]
+OPTIONS = dict(
+    no_borders=True,
+    justify=["l", "c", "r"],
+    select=["name", "status", "host"],
+    terminal_width=80,
+    patterns=[
+        (r"running", str.upper),
+        (r"stopped", str.lower),
+        (r"linuxnode-\d", str.title),
+    ],
+)
+DURATION = 1.0
+
+
+def tables_per_second(render):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        render()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    configured = Columnar(**OPTIONS)
+    cases = {
+        "rebuilt": lambda: Columnar(**OPTIONS).render(DATA, HEADERS),
+        "configured": lambda: configured.render(DATA, HEADERS),
+        "columnar()": lambda: columnar(DATA, HEADERS, **OPTIONS),
+    }
+    for name, render in cases.items():
+        print(f"{name:>12}: {tables_per_second(render):>10.0f} tables/sec")
@@ -0,0 +1,263 @@
+"""
+A benchmark suite covering rows x columns x cell length x character set x
+options, which times every stage of rendering a table and measures its peak
+memory, and compares the results with a stored baseline to catch
+regressions.
+
+Each case is rendered one stage at a time, the same way `Columnar.render`
+renders it, and the stages' output is checked against `render` itself:
+
+    clean    checking the rows, choosing the displayed columns and cleaning them
+    convert  applying patterns, stripping color codes and measuring each cell
+    plan     working out the column widths
+    emit     wrapping, justifying and joining the rows into lines
+
+Usage, from the root of a checkout, which has to be on the path for
+`columnar` to be imported unless it's installed:
+
+    PYTHONPATH=. python benchmarks/suite.py                         # every case
+    PYTHONPATH=. python benchmarks/suite.py -k cjk -k 2000x         # cases matching all filters
+    PYTHONPATH=. python benchmarks/suite.py --save baseline.json    # store a baseline
+    PYTHONPATH=. python benchmarks/suite.py --compare baseline.json # fail on regressions
+
+`--compare` exits with status 1 when a stage is slower, or uses more memory,
+than the baseline by more than `--tolerance` (25% by default). Timings are
+the best of `--repeat` runs and memory is measured in a separate run with
+`tracemalloc`, which would otherwise slow down the timings. Baselines only
+make sense on the machine they were recorded on.
+
+The same cases can be run with pytest-benchmark:
+
+    python -m pytest benchmarks/bench_suite.py
+"""
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, NamedTuple
+
+from columnar import Columnar, columnar
+
+ROW_COUNTS = [200, 2_000]
+COLUMN_COUNTS = [4, 12]
+CELL_LENGTHS = [8, 64]
+CHARSETS = ["ascii", "cjk", "emoji", "ansi"]
+STAGES = ["clean", "convert", "plan", "emit"]
+COLORS = ["\x1b[31m", "\x1b[32m", "\x1b[33m", "\x1b[34m"]
+
+
+def highlight(text):
+    return f"\x1b[1m{text}\x1b[0m"
+
+
+FLAGS = {
+    "default": {},
+    "patterns": {"patterns": [(r"^[a-f]", highlight), (r"[0-9]$", str.upper)]},
+    "wrap": {"max_column_width": 12, "wrap_max": 3},
+    "no_borders": {"no_borders": True},
+    # the first column only holds placeholders and odd columns aren't selected
+    "drop_select": {"drop": ["-"], "select": [r"^c\d*[02468]$"]},
+}
+
+
+class Case(NamedTuple):
+    num_rows: int
+    num_columns: int
+    cell_length: int
+    charset: str
+    flags: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.num_rows}x{self.num_columns}-{self.cell_length}-{self.charset}-{self.flags}"
+
+    def options(self) -> Dict[str, Any]:
+        return dict(FLAGS[self.flags], terminal_width=400)
+
+
+CASES = [
+    Case(*values)
+    for values in itertools.product(ROW_COUNTS, COLUMN_COUNTS, CELL_LENGTHS, CHARSETS, FLAGS)
+]
+
+
+def make_cell(rng: random.Random, charset: str, length: int) -> str:
+    """
+    A cell roughly `length` terminal columns wide. CJK characters and emoji
+    are two columns wide, so half as many of them are used.
+    """
+    if charset == "cjk":
+        return "".join(chr(rng.randrange(0x4E00, 0x9FA0)) for _ in range(length // 2))
+    if charset == "emoji":
+        return "".join(chr(rng.randrange(0x1F600, 0x1F650)) for _ in range(length // 2))
+    text = "".join(rng.choice("abcdefghij klmnopqrstuvwxyz0123456789") for _ in range(length))
+    if charset == "ansi":
+        return f"{rng.choice(COLORS)}{text}\x1b[0m"
+    return text
+
+
+def make_table(case: Case):
+    rng = random.Random(case.name)
+    headers = [f"c{column_no}" for column_no in range(case.num_columns)]
+    data = [
+        [make_cell(rng, case.charset, case.cell_length) for _ in range(case.num_columns)]
+        for _ in range(case.num_rows)
+    ]
+    if case.flags == "drop_select":
+        for row in data:
+            row[0] = "-"
+    return data, headers
+
+
+def run_stages(renderer: Columnar, data, headers, measure) -> str:
+    """
+    Renders a table stage by stage, calling `measure(stage, function)` to run
+    each stage, and returns the rendered table.
+    """
+
+    def clean():
+        columns = renderer.check_data(data)
+        keep = renderer.columns_to_keep(columns, headers, cleaned=False)
+        columns = [list(map(renderer.clean_cell, columns[i])) for i in keep]
+        return columns, [headers[i] for i in keep]
+
+    columns, kept_headers = measure("clean", clean)
+    column_data, header_row = measure(
+        "convert",
+        lambda: (
+            renderer.convert_data_to_logical_rows(columns),
+            renderer.convert_row_to_logical_row(kept_headers),
+        ),
+    )
+
+    def plan():
+        natural_widths = renderer.natural_column_widths(column_data)
+        natural_widths = list(map(max, natural_widths, map(max, header_row[2])))
+        return renderer.get_column_widths(natural_widths, renderer.current_terminal_width())
+
+    column_widths = measure("plan", plan)
+    return measure(
+        "emit",
+        lambda: "".join(
+            renderer.render_table(
+                header_row,
+                column_data.logical_rows(),
+                column_widths,
+                renderer.justifications_for(len(column_widths)),
+                renderer.justify,
+                None,
+            )
+        ),
+    )
+
+
+def time_case(case: Case, repeat: int) -> Dict[str, float]:
+    renderer = Columnar(**case.options())
+    data, headers = make_table(case)
+    if renderer.no_borders:
+        headers = [text.upper() for text in headers]
+    best = {}
+
+    def measure(stage, function):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best[stage] = min(best.get(stage, elapsed), elapsed)
+        return result
+
+    for _ in range(repeat):
+        table = run_stages(renderer, data, headers, measure)
+    expected = columnar(data, [text.lower() for text in headers], **case.options())
+    if table != expected:
+        raise AssertionError(f"{case.name}: the stages don't render the same table as columnar()")
+    return best
+
+
+def peak_memory(case: Case) -> Dict[str, int]:
+    renderer = Columnar(**case.options())
+    data, headers = make_table(case)
+    if renderer.no_borders:
+        headers = [text.upper() for text in headers]
+    peaks = {}
+
+    def measure(stage, function):
+        tracemalloc.reset_peak()
+        result = function()
+        peaks[stage] = tracemalloc.get_traced_memory()[1]
+        return result
+
+    tracemalloc.start()
+    try:
+        run_stages(renderer, data, headers, measure)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def run_case(case: Case, repeat: int) -> Dict[str, Dict[str, float]]:
+    seconds = time_case(case, repeat)
+    peaks = peak_memory(case)
+    return {stage: {"seconds": seconds[stage], "peak": peaks[stage]} for stage in STAGES}
+
+
+def find_regressions(
+    results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float
+) -> List[str]:
+    regressions = []
+    for name, stages in results.items():
+        for stage, measured in stages.items():
+            expected = baseline.get(name, {}).get(stage)
+            if expected is None:
+                continue
+            for metric in ("seconds", "peak"):
+                if measured[metric] > expected[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{name} {stage} {metric}: {expected[metric]:.4g} -> {measured[metric]:.4g}"
+                    )
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-k", dest="filters", action="append", default=[],
+                        help="only run cases whose name contains this, may be repeated")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per case")
+    parser.add_argument("--save", metavar="PATH", help="store the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results with a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown or memory growth, as a fraction")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if all(text in case.name for text in args.filters)]
+    results = {}
+    report = []
+    for case in cases:
+        results[case.name] = stages = run_case(case, args.repeat)
+        report.append(
+            [case.name]
+            + [f"{stages[stage]['seconds'] * 1000:.1f}" for stage in STAGES]
+            + [f"{max(stage['peak'] for stage in stages.values()) / 2**20:.1f}"]
+        )
+        print(f"{case.name}: {sum(stage['seconds'] for stage in stages.values()):.3f}s", file=sys.stderr)
+    print(columnar(report, ["case", *(f"{stage} ms" for stage in STAGES), "peak MiB"],
+                   no_borders=True, justify=["l"] + ["r"] * (len(STAGES) + 1), terminal_width=200))
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump({"python": platform.python_version(), "results": results}, fh, indent=1)
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["results"]
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
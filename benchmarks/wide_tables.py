@@ -0,0 +1,35 @@
+"""
+Measures how Columnar.get_column_widths scales with the number of columns
+when the table has to be narrowed to fit the terminal.
+
+The time per column should stay roughly constant; the shrinking loop used
+to re-sum every column for each column it brought into the reduction,
+which is quadratic in the number of columns.
+
+    PYTHONPATH=. python benchmarks/wide_tables.py
+"""
+import random
+import time
+
+from columnar import Columnar
+
+COLUMN_COUNTS = [100, 300, 1_000, 3_000, 10_000]
+REPEAT = 20
+
+
+def time_wide_table(num_columns):
+    rng = random.Random(0)
+    natural_widths = [rng.randint(1, 80) for _ in range(num_columns)]
+    renderer = Columnar(min_column_width=1, column_sep="")
+    terminal_width = sum(natural_widths) // 2
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        renderer.get_column_widths(natural_widths, terminal_width)
+    return (time.perf_counter() - start) / REPEAT
+
+
+if __name__ == "__main__":
+    print(f"{'columns':>10} {'seconds':>10} {'us/column':>10}")
+    for num_columns in COLUMN_COUNTS:
+        elapsed = time_wide_table(num_columns)
+        print(f"{num_columns:>10} {elapsed:>10.5f} {elapsed / num_columns * 1e6:>10.3f}")
@@ -0,0 +1,27 @@
+"""
+Wrapping long cells of prose into narrow columns in each wrap mode. With the
+default `wrap_max` only the first few lines of every cell are kept, so most
+of each cell is never wrapped at all.
+
+    PYTHONPATH=. python benchmarks/wrap_modes.py
+"""
+import random
+import time
+
+from columnar import columnar
+
+NUM_ROWS = 2_000
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+rng = random.Random(0)
+DATA = [
+    [" ".join(rng.choice(WORDS) for _ in range(200)), "本日のヒーロー 周東選手 " * 40]
+    for _ in range(NUM_ROWS)
+]
+
+
+if __name__ == "__main__":
+    for mode in ["char", "word", "word-hyphen"]:
+        for wrap_max in [5, 1000]:
+            start = time.perf_counter()
+            columnar(DATA, ["prose", "cjk"], max_column_width=30, wrap_max=wrap_max, wrap_mode=mode)
+            print(f"{mode:<12} wrap_max={wrap_max:<5} {time.perf_counter() - start:.3f}s")
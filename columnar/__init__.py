@@ -1,3 +1,6 @@
+from .cache import CellCache
 from .columnar import Columnar
+from .live import LiveTable
+from .stats import RenderStats
 
 columnar = Columnar()
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+A bounded memo of converted and rendered cells for columns that repeat a
+small set of values, such as a status, region or host column.
+"""
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class CellCache:
+    """
+    Remembers up to `maxsize` cells, evicting the least recently used one
+    when it is full. Pass one to `columnar()`, `render()`, `iter_lines()` or
+    `write()` as `cell_cache` and every repeated cell costs a dictionary
+    lookup instead of being run through the patterns, stripped of its color
+    codes, wrapped, justified and colorized again. `cache_info()` reports how
+    well it did.
+
+    Cells are cached per renderer, so tables rendered with different options
+    can take turns using the same cache without seeing each other's cells.
+    A cache is meant to be used for one table at a time, it isn't safe to
+    share one between threads.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        if maxsize < 1:
+            raise ValueError(f"'maxsize' must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Returns the value stored under `key`, or None if there isn't one.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.entries))
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
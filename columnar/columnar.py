@@ -1,35 +1,114 @@
-import shutil
+import codecs
 import re
 import io
-import operator
-from functools import reduce
-from itertools import zip_longest
+import os
+from collections import deque
+from functools import lru_cache
+from time import perf_counter
+from itertools import chain, count, islice
 from typing import (
+    NamedTuple,
     Union,
     Tuple,
     Sequence,
+    Iterable,
     List,
     Any,
+    Callable,
+    Iterator,
+    TextIO,
+    BinaryIO,
+    AsyncIterable,
+    AsyncIterator,
+    TYPE_CHECKING,
 )
 
-from toolz import frequencies
-from wcwidth import wcwidth, wcswidth
-
+from .cache import CellCache
 from .exceptions import TableOverflowError
+from .stats import RenderStats
+from .frames import clean_column, is_column_oriented, is_plain, slice_column, split_columns
+from .kernels import JUSTIFIERS, join_physical_lines, wrap_logical_row
+from .width import WRAP_MODES, display_width
+
+if TYPE_CHECKING:
+    import asyncio
+    from concurrent.futures import Executor
+
+CARRIAGE_RETURN = re.compile("\r")
+TAB = re.compile("\t")
+# The group keeps the color codes in the result of `split`, so a single scan
+# gives both the text and the codes between it.
+ANSI_COLOR_PATTERN = re.compile(r"(\x1b\[.+?m)")
+COLOR_RESET = "\x1b[0m"
+ESCAPE = "\x1b"
+
+# Inline flags that can be scoped to a single pattern within the combined
+# pattern dispatcher.
+SCOPED_FLAGS = {re.I: "i", re.M: "m", re.S: "s"}
+# Numbered backreferences and conditionals would refer to the wrong group once
+# a pattern is wrapped in a group of its own.
+NUMBERED_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?\(")
+
+# Number of logical rows each worker process renders at a time when
+# `workers` is greater than one.
+PARALLEL_CHUNK_SIZE = 2000
+# Number of rows measured at a time by the width-only scan of the rows
+# outside a `head`/`tail`/`offset`/`limit` window.
+SCAN_CHUNK_SIZE = 4096
+# The options a worker process needs in order to render a chunk of rows.
+CHUNK_RENDER_OPTIONS = (
+    "justify", "wrap_max", "wrap_mode", "row_sep", "column_sep", "no_borders"
+)
+
+# Number of characters `render_to` collects before encoding and writing them.
+WRITE_BUFFER_SIZE = 64 * 1024
+# Number of lines the async API renders before handing control back to the
+# event loop.
+ASYNC_CHUNK_SIZE = 500
+
+# Number of differently configured renderers that `Columnar.configure` keeps
+# around, so repeated calls such as `columnar(data, no_borders=True)` don't
+# recompile their patterns every time.
+RENDERER_CACHE_SIZE = 32
 
 # Types
 NonWrappedCell = str
 WrappedCellLine = str
 Data = List[List[NonWrappedCell]]
+Columns = List[List[NonWrappedCell]]
 Headers = List[str]
-LogicalRow = List[List[WrappedCellLine]]
+Cell = List[WrappedCellLine]
+CellWidths = List[int]
+ColorRow = List[Union[None, str]]
+# A logical row holds one cell per column, each cell being the list of lines
+# it occupies. It's only turned into physical rows once it has been wrapped.
+LogicalRow = List[Cell]
+LogicalRowWidths = List[CellWidths]
+
+
+class ColumnData(NamedTuple):
+    """
+    Cells that have been split into lines and measured, stored one column at
+    a time so that planning column widths never has to transpose the table.
+    `cells[column_no][row_no]` is the list of lines in a cell, `colors` and
+    `widths` hold the matching color codes and line widths.
+    """
+
+    cells: List[List[Cell]]
+    colors: List[ColorRow]
+    widths: List[List[CellWidths]]
+
+    def logical_rows(self) -> Iterator[Tuple[LogicalRow, ColorRow, LogicalRowWidths]]:
+        """
+        Transposes the columns back into logical rows one row at a time, as
+        they are emitted.
+        """
+        return zip(zip(*self.cells), zip(*self.colors), zip(*self.widths))
 
 
 class Columnar:
-    def __call__(
+    def __init__(
         self,
-        data: Sequence[Sequence[Any]],
-        headers: Union[None, Sequence[Any]] = None,
         head: int = 0,
         justify: Union[str, List[str]] = "l",
         wrap_max: int = 5,
@@ -43,118 +122,871 @@ class Columnar:
         no_borders: bool = False,
         terminal_width: Union[None, int] = None,
         preformatted_headers: bool = False,
-    ) -> str:
+        sample_size: Union[None, int] = None,
+        sample_strategy: str = "head",
+        column_widths: Union[None, Sequence[int]] = None,
+        workers: int = 1,
+        paging: bool = False,
+        key_columns: Sequence[str] = [],
+        tail: int = 0,
+        offset: int = 0,
+        limit: Union[None, int] = None,
+        window_widths: str = "window",
+        elided_marker: Union[None, str] = "... {count} more rows ...",
+        wrap_mode: str = "char",
+    ) -> None:
+        """
+        Holds the options used to render tables. Everything that only depends
+        on the options, such as the compiled `patterns` and `select` regular
+        expressions and the justification functions, is prepared here once so
+        that rendering many tables with the same renderer is cheap.
+
+        Rendering a table never modifies the renderer, all of the state
+        belonging to a single table lives in local variables, so one renderer
+        can be shared by any number of threads.
+        """
+        self.options = {name: value for name, value in locals().items() if name != "self"}
+        self.head = head
+        self.justify = justify
         self.wrap_max = wrap_max
+        if wrap_mode not in WRAP_MODES:
+            raise ValueError(
+                f"'wrap_mode' must be one of {', '.join(map(repr, WRAP_MODES))}. Got {wrap_mode!r}"
+            )
+        self.wrap_mode = wrap_mode
         self.max_column_width = max_column_width
         self.min_column_width = min_column_width
-        self.justify = justify
-        self.head = head
-        self.terminal_width = (
-            terminal_width
-            if terminal_width is not None
-            else shutil.get_terminal_size().columns
-        )
+        self.terminal_width = terminal_width
         self.row_sep = row_sep
         self.column_sep = column_sep
         self.header_sep = "="
         self.patterns = self.compile_patterns(patterns)
-        self.ansi_color_pattern = re.compile(r"\x1b\[.+?m")
-        self.color_reset = "\x1b[0m"
-        self.color_grid = None
+        self.pattern_dispatcher, self.pattern_functions = self.compile_dispatcher(
+            self.patterns
+        )
+        self.ansi_color_pattern = ANSI_COLOR_PATTERN
+        self.color_reset = COLOR_RESET
         self.drop = drop
         self.select = select
+        self.select_patterns = [re.compile(pattern, re.I) for pattern in select]
+        self.paging = paging
+        self.tail = tail
+        self.offset = offset
+        self.limit = limit
+        if window_widths not in ("window", "all"):
+            raise ValueError(
+                f"'window_widths' must be either \"window\" or \"all\". Got {window_widths!r}"
+            )
+        self.window_widths = window_widths
+        self.elided_marker = elided_marker
+        self.windowed = bool(head or tail or offset or limit is not None)
+        self.key_columns = key_columns
+        self.key_patterns = [re.compile(pattern, re.I) for pattern in key_columns]
+        if type(justify) is str:
+            self.justifications = JUSTIFIERS[justify]
+        else:
+            self.justifications = [JUSTIFIERS[spec] for spec in justify]
         self.no_borders = no_borders
-        self.no_headers = headers is None
-        data = self.clean_data(data)
-
-        if self.no_headers:
-            headers = [""] * len(data[0])
-
+        self.preformatted_headers = preformatted_headers
+        self.sample_size = sample_size
+        self.sample_strategy = sample_strategy
+        self.column_widths = column_widths
+        self.workers = workers
         if self.no_borders:
             self.column_sep = " " * 2
             self.row_sep = ""
             self.header_sep = ""
-            if not preformatted_headers:
-                headers = [text.upper() for text in headers]
 
-        data, headers = self.filter_columns(data, headers)
-        if self.no_headers:
-            logical_rows = self.convert_data_to_logical_rows(data)
+    def configure(self, **options) -> "Columnar":
+        """
+        Returns a renderer with `options` replacing the options of this one.
+        Accepts the same keyword arguments as `Columnar()`.
+
+        Renderers are immutable, so the most recently configured ones are
+        cached and handed out again when the same options are asked for.
+        Options that can't be hashed, e.g. a dict of patterns, simply
+        bypass the cache.
+        """
+        if not options:
+            return self
+        options = {**self.options, **options}
+        key = (
+            type(self),
+            tuple(
+                (name, tuple(value) if type(value) is list else value)
+                for name, value in options.items()
+            ),
+        )
+        try:
+            return configured_renderer(key)
+        except TypeError:
+            return type(self)(**options)
+
+    def render(
+        self,
+        data: Iterable[Sequence[Any]],
+        headers: Union[None, Sequence[Any]] = None,
+        *,
+        cell_cache: Union[None, CellCache] = None,
+        stats: Union[None, RenderStats] = None,
+    ) -> str:
+        """
+        Renders `data` as a table using this renderer's options.
+        """
+        return "".join(self.iter_lines(data, headers, cell_cache=cell_cache, stats=stats))
+
+    def __call__(
+        self,
+        data: Iterable[Sequence[Any]],
+        headers: Union[None, Sequence[Any]] = None,
+        *,
+        cell_cache: Union[None, CellCache] = None,
+        stats: Union[None, RenderStats] = None,
+        **options,
+    ) -> str:
+        """
+        Renders `data` as a table and returns it as a string. Keyword
+        arguments are the same as those of `Columnar()` and override this
+        renderer's options for this table only.
+
+        Passing a `CellCache` as `cell_cache` memoizes repeated cells, which
+        pays off for columns that only hold a handful of distinct values, and
+        passing a `RenderStats` as `stats` records where the time went.
+        """
+        return "".join(
+            self.iter_lines(data, headers, cell_cache=cell_cache, stats=stats, **options)
+        )
+
+    def write(
+        self,
+        out_stream: TextIO,
+        data: Iterable[Sequence[Any]],
+        headers: Union[None, Sequence[Any]] = None,
+        *,
+        cell_cache: Union[None, CellCache] = None,
+        stats: Union[None, RenderStats] = None,
+        **options,
+    ) -> None:
+        """
+        Writes the table to a file-like object one physical line at a time
+        instead of building the whole table in memory. Accepts the same
+        arguments as `__call__`.
+        """
+        lines = self.iter_lines(data, headers, cell_cache=cell_cache, stats=stats, **options)
+        for line in lines:
+            out_stream.write(line)
+
+    def render_to(
+        self,
+        fp: Union[int, BinaryIO],
+        data: Iterable[Sequence[Any]],
+        headers: Union[None, Sequence[Any]] = None,
+        *,
+        cell_cache: Union[None, CellCache] = None,
+        stats: Union[None, RenderStats] = None,
+        encoding: str = "utf-8",
+        buffer_size: int = WRITE_BUFFER_SIZE,
+        **options,
+    ) -> None:
+        """
+        Writes the table as encoded bytes to a binary file-like object or to
+        a file descriptor. Lines are collected until they add up to
+        `buffer_size` characters and then encoded and written together, so at
+        most one chunk of the table is held in memory as text and as bytes.
+        The chunks are encoded incrementally, so encodings with a byte order
+        mark, such as UTF-16, only write it once. Accepts the same arguments
+        as `__call__`.
+        """
+        if buffer_size < 1:
+            raise ValueError(f"'buffer_size' must be at least 1, got {buffer_size}")
+        if isinstance(fp, int):
+            write = lambda chunk: write_to_descriptor(fp, chunk)
         else:
-            logical_rows = self.convert_data_to_logical_rows([headers] + data)
-        column_widths = self.get_column_widths(logical_rows)
-        truncated_rows = self.wrap_and_truncate_logical_cells(
-            logical_rows, column_widths
+            write = fp.write
+        encode = codecs.getincrementalencoder(encoding)().encode
+        pending = []
+        pending_size = 0
+        lines = self.iter_lines(data, headers, cell_cache=cell_cache, stats=stats, **options)
+        for line in lines:
+            pending.append(line)
+            pending_size += len(line)
+            if pending_size >= buffer_size:
+                write(encode("".join(pending)))
+                pending = []
+                pending_size = 0
+        chunk = encode("".join(pending), final=True)
+        if chunk:
+            write(chunk)
+
+    def iter_lines(
+        self,
+        data: Iterable[Sequence[Any]],
+        headers: Union[None, Sequence[Any]] = None,
+        *,
+        cell_cache: Union[None, CellCache] = None,
+        stats: Union[None, RenderStats] = None,
+        **options,
+    ) -> Iterator[str]:
+        """
+        Yields the table one physical line at a time, each line ending in a
+        new-line character. Column widths still have to be planned from every
+        row, but wrapping, justification and colorization are done lazily as
+        lines are requested, so the first line is available before the rest
+        of the table has been laid out.
+
+        When `sample_size` or `column_widths` is given `data` may be any
+        iterable of rows, e.g. a generator or a database cursor. Column
+        widths are then planned from a sample of `sample_size` rows, or taken
+        from `column_widths`, and the remaining rows are streamed through
+        without being held in memory. `sample_strategy` selects the sample:
+        "head" uses the first `sample_size` rows, "reservoir" draws a random
+        sample from all of the rows, which requires a second pass over `data`.
+        Cells that are wider than the planned width are wrapped and truncated
+        as usual.
+
+        With a `cell_cache` each distinct cell is converted and rendered once
+        per column width, later occurrences are looked up. The cache is only
+        used when rendering in this process, not by `workers`.
+
+        With `stats` the time spent in each stage of rendering, and how much
+        work each stage did, is added to the `RenderStats`. Nothing is
+        measured without it.
+        """
+        if options:
+            return self.configure(**options).iter_lines(
+                data, headers, cell_cache=cell_cache, stats=stats
+            )
+        lines = self.generate_lines(data, headers, cell_cache, stats)
+        if stats is None:
+            return lines
+        return stats.measure(lines)
+
+    async def render_async(
+        self,
+        data: Union[Iterable[Sequence[Any]], AsyncIterable[Sequence[Any]]],
+        headers: Union[None, Sequence[Any]] = None,
+        *,
+        cell_cache: Union[None, CellCache] = None,
+        stats: Union[None, RenderStats] = None,
+        chunk_size: int = ASYNC_CHUNK_SIZE,
+        executor: Union[None, "Executor"] = None,
+        **options,
+    ) -> str:
+        """
+        Renders the table without blocking the event loop and returns it as a
+        string. Accepts the same arguments as `aiter_lines`.
+        """
+        chunks = self.generate_chunks_async(
+            data, headers, cell_cache, stats, chunk_size, executor, options
         )
+        return "".join([line async for chunk in chunks for line in chunk])
 
-        justification_map = {
-            "l": lambda text, width: self.visual_justify(text, width, 'l'),
-            "c": lambda text, width: self.visual_justify(text, width, 'c'),
-            "r": lambda text, width: self.visual_justify(text, width, 'r'),
-        }
-        justifications = []
-        if type(justify) is str:
-            justifications = [justification_map[justify]] * len(column_widths)
+    async def aiter_lines(
+        self,
+        data: Union[Iterable[Sequence[Any]], AsyncIterable[Sequence[Any]]],
+        headers: Union[None, Sequence[Any]] = None,
+        *,
+        cell_cache: Union[None, CellCache] = None,
+        stats: Union[None, RenderStats] = None,
+        chunk_size: int = ASYNC_CHUNK_SIZE,
+        executor: Union[None, "Executor"] = None,
+        **options,
+    ) -> AsyncIterator[str]:
+        """
+        The async counterpart of `iter_lines`, for rendering tables inside an
+        event loop. Lines are rendered `chunk_size` at a time and control goes
+        back to the event loop between chunks, so other tasks keep running
+        while a large table is produced.
+
+        Column widths are planned while the first chunk is rendered, which
+        for a large table is the longest stretch of work, so the first chunk
+        is always rendered off the event loop, on the loop's default executor.
+        Passing a thread pool as `executor` renders every chunk, planning
+        included, on one of its threads instead.
+
+        `data` may also be an async iterable of rows, such as an async
+        database cursor. Its rows are gathered before rendering starts, unless
+        there is an `executor` and the rows can be streamed because of
+        `sample_size`, `column_widths` or a `head`/`tail`/`offset`/`limit`
+        window. The rendering thread then has the event loop fetch each row as
+        it's needed.
+        """
+        chunks = self.generate_chunks_async(
+            data, headers, cell_cache, stats, chunk_size, executor, options
+        )
+        async for chunk in chunks:
+            for line in chunk:
+                yield line
+
+    async def generate_chunks_async(
+        self,
+        data: Union[Iterable[Sequence[Any]], AsyncIterable[Sequence[Any]]],
+        headers: Union[None, Sequence[Any]],
+        cell_cache: Union[None, CellCache],
+        stats: Union[None, RenderStats],
+        chunk_size: int,
+        executor: Union[None, "Executor"],
+        options: dict,
+    ) -> AsyncIterator[List[str]]:
+        import asyncio
+
+        if chunk_size < 1:
+            raise ValueError(f"'chunk_size' must be at least 1, got {chunk_size}")
+        renderer = self.configure(**options) if options else self
+        loop = asyncio.get_running_loop()
+        if isinstance(data, AsyncIterable):
+            streamed = (
+                renderer.sample_size is not None
+                or renderer.column_widths is not None
+                or renderer.windowed
+            )
+            if executor is not None and streamed:
+                data = rows_from_event_loop(data, loop)
+            else:
+                data = [row async for row in data]
+        lines = renderer.iter_lines(data, headers, cell_cache=cell_cache, stats=stats)
+        planned = False
+        pending = None
+        try:
+            while True:
+                if executor is None and planned:
+                    chunk = list(islice(lines, chunk_size))
+                else:
+                    # cleaning, converting and planning all happen before the
+                    # first line, so that chunk never runs in the event loop
+                    pending = loop.run_in_executor(executor, list, islice(lines, chunk_size))
+                    # shielded so that cancelling the caller leaves the future
+                    # tracking the thread, which can't be interrupted
+                    chunk = await asyncio.shield(pending)
+                    pending = None
+                    planned = True
+                if not chunk:
+                    return
+                yield chunk
+                if executor is None:
+                    await asyncio.sleep(0)
+        finally:
+            if pending is None:
+                lines.close()
+            else:
+                # the lines are still being rendered on the executor, and can
+                # only be closed once it's done with them
+                pending.add_done_callback(lambda future: close_after(future, lines))
+
+    def generate_lines(
+        self,
+        data: Iterable[Sequence[Any]],
+        headers: Union[None, Sequence[Any]],
+        cell_cache: Union[None, CellCache] = None,
+        stats: Union[None, RenderStats] = None,
+    ) -> Iterator[str]:
+        clock = None if stats is None else perf_counter()
+        sample_size = self.sample_size
+        column_widths = self.column_widths
+        plain_widths = None
+        gaps = []
+        hidden_widths = None
+        cleaned = True
+        scan_hidden = self.windowed and self.window_widths == "all" and column_widths is None
+        if is_column_oriented(data):
+            labels, columns, plain_widths, gaps, hidden_widths = self.clean_columns(
+                data, scan_hidden
+            )
+            if headers is None:
+                headers = labels
+            sample_size = None
+            rest, num_columns = iter([]), len(columns)
         else:
-            justifications = [justification_map[spec] for spec in justify]
-
-        table_width = sum(column_widths) + ((len(column_widths) + 1) * len(row_sep))
-        out = io.StringIO()
-        write_header = True if not self.no_headers else False
-        self.write_row_separators(out, column_widths)
-        for lrow, color_row in zip(truncated_rows, self.color_grid):
-            for row in lrow:
-                justified_row_parts = [
-                    justifier(text, width)
-                    for text, justifier, width in zip(
-                        row, justifications, column_widths
+            if self.windowed:
+                data, gaps, hidden_widths, num_columns = self.window_rows(data, scan_hidden)
+            if self.windowed and data == [] and num_columns:
+                # every row is outside the window
+                columns = [[] for _ in range(num_columns)]
+                rest = iter([])
+            elif sample_size is None and column_widths is None:
+                # cells are only cleaned once the columns to display are known
+                columns = self.check_data(data)
+                cleaned = False
+                rest, num_columns = iter([]), len(columns)
+            else:
+                sample, rest, num_columns = self.split_sample(
+                    data, sample_size, self.sample_strategy
+                )
+                if self.drop and not sample:
+                    raise ValueError(
+                        "'drop' needs rows to inspect, pass a 'sample_size' along with 'column_widths'."
                     )
+                columns = self.rows_to_columns(sample, num_columns)
+                cleaned = False
+        if stats is not None:
+            clock = stats.record("clean", clock)
+
+        no_headers = headers is None
+        if no_headers:
+            headers = [""] * num_columns
+
+        if self.no_borders and not self.preformatted_headers:
+            headers = [text.upper() for text in headers]
+
+        keep = self.columns_to_keep(columns, headers, cleaned)
+        columns = [columns[i] for i in keep]
+        headers = [headers[i] for i in keep]
+        if stats is not None:
+            clock = stats.record("filter", clock)
+        if not cleaned:
+            columns = [list(map(self.clean_cell, column)) for column in columns]
+            if stats is not None:
+                clock = stats.record("clean", clock)
+        if plain_widths is not None and not self.patterns:
+            planned = self.plain_column_data(columns, [plain_widths[i] for i in keep])
+        else:
+            planned = self.convert_data_to_logical_rows(columns, cell_cache)
+        header_row = None if no_headers else self.convert_row_to_logical_row(headers)
+        if stats is not None:
+            stats.record("convert", clock)
+            self.count_converted_cells(columns, stats)
+            clock = perf_counter()
+        pages = None
+        if column_widths is None:
+            natural_widths = self.natural_column_widths(planned)
+            if header_row is not None:
+                natural_widths = list(map(max, natural_widths, map(max, header_row[2])))
+            if hidden_widths:
+                natural_widths = [
+                    max(width, hidden_widths[i]) if i < len(hidden_widths) else width
+                    for width, i in zip(natural_widths, keep)
                 ]
-                colorized_row_parts = [
-                    self.colorize(text, code)
-                    for text, code in zip(justified_row_parts, color_row)
-                ]
-                out.write(
-                    self.column_sep
-                    + self.column_sep.join(colorized_row_parts)
-                    + self.column_sep
-                    + "\n"
+            terminal_width = self.current_terminal_width()
+            try:
+                column_widths = self.get_column_widths(natural_widths, terminal_width)
+            except TableOverflowError:
+                if not self.paging:
+                    raise
+                pages = self.plan_pages(natural_widths, headers, terminal_width)
+        elif len(column_widths) != len(keep):
+            raise ValueError(
+                f"'column_widths' must have one width for each of the {len(keep)} displayed columns, got {len(column_widths)}."
+            )
+        if stats is not None:
+            stats.record("plan", clock)
+            if pages is None:
+                stats.wrapped_lines += sum(
+                    width > column_width
+                    for column, column_width in zip(planned.widths, column_widths)
+                    for cell_widths in column
+                    for width in cell_widths
                 )
-            if write_header:
-                out.write(
-                    self.column_sep
-                    + (self.header_sep * (table_width - (len(self.column_sep * 2))))
-                    + self.column_sep
-                    + "\n"
+        rows = self.project_rows(rest, keep)
+        # a reservoir sample is only used for planning, the table itself is
+        # rendered from a second pass over the data
+        render_planned = not (self.sample_strategy == "reservoir" and sample_size is not None)
+        cached = cell_cache is not None and self.workers == 1
+        if not cached:
+            if stats is not None:
+                rows = self.count_streamed_rows(rows, stats)
+            rows = (self.convert_row_to_logical_row(row) for row in rows)
+            if stats is not None and pages is None:
+                rows = self.count_wrapped_lines(rows, column_widths, stats)
+            if render_planned:
+                rows = chain(planned.logical_rows(), rows)
+        elif render_planned:
+            # cached cells are looked up by their text rather than converted
+            rows = chain(zip(*columns), rows)
+
+        pool = None
+        if self.workers > 1:
+            # only imported when it's needed, it roughly doubles the import
+            # time. One pool renders every page and every run of rows
+            # between the gaps
+            from concurrent.futures import ProcessPoolExecutor
+
+            pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            if pages is None:
+                yield from self.render_table(
+                    header_row,
+                    rows,
+                    column_widths,
+                    self.justifications_for(len(column_widths)),
+                    self.justify,
+                    cell_cache if cached else None,
+                    gaps,
+                    pool,
                 )
-                write_header = False
+                return
+            # every page is rendered from the same cleaned and converted rows
+            rows = list(rows)
+            for page_no, (page_columns, page_widths) in enumerate(pages):
+                if page_no > 0:
+                    yield "\n"
+                justify = self.justify
+                justifications = self.justifications_for(len(keep))
+                if type(justify) is not str:
+                    justify = [justify[i] for i in page_columns]
+                    justifications = [justifications[i] for i in page_columns]
+                if cached:
+                    page_rows = ([row[i] for i in page_columns] for row in rows)
+                else:
+                    page_rows = (
+                        self.project_logical_row(row, page_columns) for row in rows
+                    )
+                yield from self.render_table(
+                    None if header_row is None else self.project_logical_row(header_row, page_columns),
+                    page_rows,
+                    page_widths,
+                    justifications,
+                    justify,
+                    cell_cache if cached else None,
+                    gaps,
+                    pool,
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def render_table(
+        self,
+        header_row: Union[None, Tuple[LogicalRow, ColorRow, LogicalRowWidths]],
+        rows: Iterator[Any],
+        column_widths: List[int],
+        justifications: List[Callable[[str, int, int], str]],
+        justify: Union[str, List[str]],
+        cell_cache: Union[None, CellCache],
+        gaps: List[Tuple[int, int]] = [],
+        pool: Union[None, "Executor"] = None,
+    ) -> Iterator[str]:
+        """
+        Emits a table whose column widths are known: the header, if there is
+        one, followed by every row. `rows` holds logical rows, or rows of
+        cleaned cells when they are rendered through `cell_cache`. Each of the
+        `gaps`, a pair of the number of rows shown before it and the number of
+        rows left out, is marked with an `elided_marker` line. The rows are
+        rendered on `pool` when one is given.
+        """
+        # every separator in the table is the same line, so it's built once
+        row_separator = self.row_separator_line(column_widths)
+        yield row_separator
+        if header_row is not None:
+            yield from self.render_logical_row(*header_row, column_widths, justifications)
+            yield self.header_separator_line(column_widths)
+        rows = iter(rows)
+        shown = 0
+        for position, num_hidden in [*gaps, (None, 0)]:
+            segment = rows if position is None else islice(rows, position - shown)
+            shown = position
+            if pool is not None:
+                yield from self.render_rows_in_parallel(
+                    segment, column_widths, pool, justify
+                )
+            elif cell_cache is not None:
+                for row in segment:
+                    yield from self.render_cached_row(
+                        row, column_widths, justifications, cell_cache
+                    )
+                    if not self.no_borders:
+                        yield row_separator
             else:
+                for lrow, color_row, lrow_widths in segment:
+                    yield from self.render_logical_row(
+                        lrow, color_row, lrow_widths, column_widths, justifications
+                    )
+                    if not self.no_borders:
+                        yield row_separator
+            if num_hidden and self.elided_marker is not None:
+                yield self.elided_marker_line(num_hidden, column_widths)
                 if not self.no_borders:
-                    self.write_row_separators(out, column_widths)
-        return out.getvalue()
+                    yield row_separator
+
+    def elided_marker_line(self, num_hidden: int, column_widths: Sequence[int]) -> str:
+        """
+        A line spanning the table that stands in for `num_hidden` rows which
+        aren't shown.
+        """
+        inner_width = sum(column_widths) + (len(column_widths) - 1) * len(self.column_sep)
+        text = self.elided_marker.format(count=num_hidden)
+        while text and display_width(text) > inner_width:
+            text = text[:-1]
+        # centred by display width, wide characters take two columns
+        text = text.center(inner_width - display_width(text) + len(text))
+        return self.column_sep + text + self.column_sep + "\n"
+
+    def plan_pages(
+        self, natural_widths: List[int], headers: Headers, terminal_width: int
+    ) -> List[Tuple[List[int], List[int]]]:
+        """
+        Splits the columns of a table that is too wide for the terminal into
+        pages, each of which is rendered as a table of its own. Columns whose
+        header matches one of the `key_columns` patterns start every page and
+        the remaining columns are added to a page, in order, for as long as
+        they fit at their natural widths. A column too wide for a page of its
+        own is wrapped as usual. Returns the column numbers on each page along
+        with their widths.
+        """
+        key_patterns = self.key_patterns
+        keys = [
+            column_no
+            for column_no, header in enumerate(headers)
+            if any(pattern.search(header) for pattern in key_patterns)
+        ]
+        separator = len(self.column_sep)
+        widths = [
+            self.clamp_column_width(
+                width if self.max_column_width == None else min(width, self.max_column_width)
+            )
+            for width in natural_widths
+        ]
+        keys_width = separator + sum(widths[column_no] + separator for column_no in keys)
+        pages = []
+        page = []
+        page_width = keys_width
+        is_key = set(keys)
+        for column_no in range(len(headers)):
+            if column_no in is_key:
+                continue
+            width = widths[column_no] + separator
+            if page and page_width + width > terminal_width:
+                pages.append(page)
+                page = []
+                page_width = keys_width
+            page.append(column_no)
+            page_width += width
+        if page or not pages:
+            pages.append(page)
+        return [
+            (
+                keys + page,
+                self.get_column_widths(
+                    [natural_widths[column_no] for column_no in keys + page], terminal_width
+                ),
+            )
+            for page in pages
+        ]
+
+    def project_logical_row(
+        self, row: Tuple[LogicalRow, ColorRow, LogicalRowWidths], columns: List[int]
+    ) -> Tuple[LogicalRow, ColorRow, LogicalRowWidths]:
+        lrow, color_row, lrow_widths = row
+        return (
+            [lrow[i] for i in columns],
+            [color_row[i] for i in columns],
+            [lrow_widths[i] for i in columns],
+        )
+
+    def justifications_for(self, num_columns: int) -> List[Callable[[str, int, int], str]]:
+        if type(self.justify) is str:
+            return [self.justifications] * num_columns
+        return self.justifications
+
+    def render_logical_row(
+        self,
+        lrow: LogicalRow,
+        color_row: ColorRow,
+        lrow_widths: LogicalRowWidths,
+        column_widths: List[int],
+        justifications: List[Callable[[str, int, int], str]],
+    ) -> List[str]:
+        """
+        Wraps, justifies and colorizes a logical row, returning each of the
+        physical lines it occupies. This is the only place the cells of a
+        logical row are transposed into physical rows.
+        """
+        cells, cell_widths = self.wrap_and_truncate_logical_row(
+            lrow, column_widths, lrow_widths
+        )
+        return join_physical_lines(
+            cells,
+            cell_widths,
+            column_widths,
+            justifications,
+            color_row,
+            self.column_sep,
+            self.color_reset,
+        )
+
+    def render_cached_row(
+        self,
+        row: Sequence[NonWrappedCell],
+        column_widths: List[int],
+        justifications: List[Callable[[str, int, int], str]],
+        cell_cache: CellCache,
+    ) -> Iterator[str]:
+        """
+        Renders a row of cleaned cells the same way `render_logical_row`
+        renders its logical row, taking each cell's wrapped, justified and
+        colorized lines from `cell_cache` when the same text has already been
+        rendered at the same width by this renderer.
+        """
+        cells = []
+        for text, width, justifier in zip(row, column_widths, justifications):
+            key = (self, justifier, width, text)
+            cell = cell_cache.get(key)
+            if cell is None:
+                cell = self.render_cell(text, width, justifier)
+                cell_cache.put(key, cell)
+            cells.append(cell)
+        # shorter cells are padded to the number of lines in the tallest cell
+        # before wrapping, see `wrap_and_truncate_logical_row`
+        height = max((num_lines for _, _, num_lines in cells), default=0)
+        max_lines = self.wrap_max + 1
+        num_physical = max(
+            (min(len(lines) + height - num_lines, max_lines) for lines, _, num_lines in cells),
+            default=0,
+        )
+        column_sep = self.column_sep
+        line_end = column_sep + "\n"
+        for line_no in range(num_physical):
+            parts = [
+                lines[line_no] if line_no < len(lines) else blank
+                for lines, blank, _ in cells
+            ]
+            yield f"{column_sep}{column_sep.join(parts)}{line_end}"
+
+    def render_cell(
+        self,
+        text: NonWrappedCell,
+        width: int,
+        justifier: Callable[[str, int, int], str],
+    ) -> Tuple[List[str], str, int]:
+        """
+        Converts, wraps, justifies and colorizes a single cell, returning its
+        physical lines, the blank line it's padded with and the number of
+        lines the cell had before wrapping.
+        """
+        lines, color, line_widths = self.convert_cell(text)
+        (wrapped,), (wrapped_widths,) = self.wrap_and_truncate_logical_row(
+            [lines], [width], [line_widths]
+        )
+        rendered = [
+            self.colorize(justifier(line, width, line_width), color)
+            for line, line_width in zip(wrapped, wrapped_widths)
+        ]
+        return rendered, self.colorize(justifier("", width, 0), color), len(lines)
+
+    def render_rows_in_parallel(
+        self,
+        rows: Iterator[Tuple[LogicalRow, ColorRow, LogicalRowWidths]],
+        column_widths: List[int],
+        pool: "Executor",
+        justify: Union[None, str, List[str]] = None,
+    ) -> Iterator[str]:
+        """
+        Spreads the wrapping, justification and colorization of the logical
+        rows across `pool`, a pool of `self.workers` processes. The rows are sent in
+        chunks of `PARALLEL_CHUNK_SIZE` and the rendered chunks are yielded in
+        their original order, so the output is identical to rendering them
+        serially. Only a few chunks are in flight at a time, which keeps
+        memory bounded when the rows are being streamed.
+        """
+        options = {name: self.options[name] for name in CHUNK_RENDER_OPTIONS}
+        if justify is not None:
+            options["justify"] = justify
+        pending = deque()
+        while True:
+            chunk = list(islice(rows, PARALLEL_CHUNK_SIZE))
+            if chunk:
+                pending.append(pool.submit(render_chunk, options, column_widths, chunk))
+            if pending and (not chunk or len(pending) >= self.workers * 2):
+                yield from pending.popleft().result()
+            elif not chunk:
+                return
+
+    def current_terminal_width(self) -> int:
+        """
+        The `terminal_width` option, or else the width of the terminal, which
+        is measured the first time it's needed and then remembered until
+        `refresh_terminal_width` is called.
+        """
+        if self.terminal_width is not None:
+            return self.terminal_width
+        return terminal_columns()
+
+    def refresh_terminal_width(self) -> int:
+        """
+        Measures the terminal again, e.g. after it has been resized, and
+        returns the width tables will now be rendered at.
+        """
+        terminal_columns.cache_clear()
+        return self.current_terminal_width()
 
     def write_row_separators(
         self, out_stream: io.StringIO, column_widths: Sequence[int]
     ) -> None:
+        out_stream.write(self.row_separator_line(column_widths))
+
+    def row_separator_line(self, column_widths: Sequence[int]) -> str:
         cells = [self.row_sep * width for width in column_widths]
-        out_stream.write(
-            self.column_sep + self.column_sep.join(cells) + self.column_sep + "\n"
+        return self.column_sep + self.column_sep.join(cells) + self.column_sep + "\n"
+
+    def header_separator_line(self, column_widths: Sequence[int]) -> str:
+        table_width = sum(column_widths) + ((len(column_widths) + 1) * len(self.row_sep))
+        return (
+            self.column_sep
+            + (self.header_sep * (table_width - (len(self.column_sep * 2))))
+            + self.column_sep
+            + "\n"
         )
 
     def compile_patterns(self, patterns):
         out = []
         for regex, func in patterns:
-            if regex is not re.Pattern:
+            if not isinstance(regex, re.Pattern):
                 regex = re.compile(regex)
             out.append((regex, func))
         return out
 
+    def compile_dispatcher(
+        self, patterns: List[Tuple[re.Pattern, Callable[[str], str]]]
+    ) -> Tuple[Union[None, re.Pattern], dict]:
+        """
+        Combines the patterns into a single regular expression, one named
+        group per pattern, so that a cell is matched against all of them in
+        one call. Alternatives are tried in order at the start of the cell,
+        which gives the same first-match priority as trying each pattern in
+        turn, and the name of the matching group picks the function to apply.
+
+        Returns None for the dispatcher when there are no patterns or when
+        they can't be combined, e.g. because they use numbered backreferences,
+        and `apply_patterns` then tries each pattern in turn.
+        """
+        if not patterns:
+            return None, {}
+        alternatives = []
+        functions = {}
+        for pattern_no, (regex, func) in enumerate(patterns):
+            if not isinstance(regex.pattern, str):
+                return None, {}
+            if NUMBERED_GROUP_REFERENCE.search(regex.pattern):
+                return None, {}
+            flags = regex.flags & ~re.U
+            scoped = "".join(letter for flag, letter in SCOPED_FLAGS.items() if flags & flag)
+            if flags & ~(re.I | re.M | re.S):
+                return None, {}
+            source = f"(?{scoped}:{regex.pattern})" if scoped else regex.pattern
+            name = f"columnar_pattern_{pattern_no}"
+            alternatives.append(f"(?P<{name}>{source})")
+            functions[name] = func
+        try:
+            return re.compile("|".join(alternatives)), functions
+        except re.error:
+            return None, {}
+
     def colorize(self, text, code):
         if code == None:
             return text
         return "".join([code, text, self.color_reset])
 
-    def clean_data(self, data: Sequence[Sequence[Any]]) -> Data:
+    def clean_data(self, data: Sequence[Sequence[Any]]) -> Columns:
+        """
+        Checks that `data` is a list of equal length lists and returns its cells
+        converted to strings, one list per column.
+        """
+        return [list(map(self.clean_cell, column)) for column in self.check_data(data)]
+
+    def check_data(self, data: Sequence[Sequence[Any]]) -> List[Tuple[Any, ...]]:
+        """
+        Checks that `data` is a list of equal length lists and returns its
+        cells, as they are, one tuple per column.
+        """
         # First make sure data is a list of lists
         if type(data) is not list:
             raise TypeError(f"'data' must be a list of lists. Got a {type(data)}")
@@ -162,121 +994,534 @@ class Columnar:
             raise TypeError(f"'data' must be a list of lists. Got an empty list")
         if type(data[0]) is not list:
             raise TypeError(f"'data' must be a list of lists. Got a list of {type(data[0])}")
-        # Make sure all the lists are the same length
         num_columns = len(data[0])
         for row_num, row in enumerate(data):
-            if len(row) != num_columns:
+            self.check_row_length(row, num_columns, row_num)
+        return list(zip(*data))
+
+    def clean_cell(self, cell: Any) -> NonWrappedCell:
+        cell = str(cell)
+        if "\r" in cell:
+            cell = CARRIAGE_RETURN.sub("", cell)
+        if "\t" in cell:
+            cell = TAB.sub(" " * 4, cell)
+        return cell
+
+    def clean_rows(
+        self, rows: Iterable[Sequence[Any]], num_columns: int
+    ) -> Iterator[List[NonWrappedCell]]:
+        """
+        Lazily converts each row to a list of strings, making sure all the rows
+        have the same number of columns.
+        """
+        for row in self.check_rows(rows, num_columns):
+            yield list(map(self.clean_cell, row))
+
+    def check_rows(
+        self, rows: Iterable[Sequence[Any]], num_columns: int, first_row_num: int = 0
+    ) -> Iterator[Sequence[Any]]:
+        """
+        Lazily makes sure all the rows have the same number of columns,
+        leaving the cells as they are.
+        """
+        for row_num, row in enumerate(rows, first_row_num):
+            self.check_row_length(row, num_columns, row_num)
+            yield row
+
+    def rows_to_columns(self, rows: Data, num_columns: int) -> Columns:
+        if not rows:
+            return [[] for _ in range(num_columns)]
+        return [list(column) for column in zip(*rows)]
+
+    def clean_columns(self, data: Any, scan_hidden: bool = False) -> Tuple[
+        Union[None, Headers],
+        Columns,
+        Union[None, List[List[int]]],
+        List[Tuple[int, int]],
+        Union[None, List[int]],
+    ]:
+        """
+        Cleans column-oriented input, a pandas DataFrame, a NumPy array or a
+        dict of columns, one whole column at a time. Returns the column labels
+        (None for arrays), the cleaned columns and, if every cell is plain
+        printable ASCII, the width of every cell, also one list per column.
+
+        When `head`, `tail`, `offset` or `limit` are set only the rows in the
+        window are cleaned, and the gaps left by rows that aren't shown are
+        returned along with, if `scan_hidden`, the width of the widest of those
+        rows in each column.
+        """
+        labels, columns = split_columns(data)
+        if not columns or len(columns[0]) == 0:
+            raise TypeError("'data' must contain at least one row and one column.")
+        num_rows = len(columns[0])
+        for column_no, column in enumerate(columns):
+            if len(column) != num_rows:
                 raise ValueError(
-                    f"All the rows in 'data' must have the same number of columns, however the first row had {num_columns} columns and row number {row_num + 1} had {len(row)} column(s)."
+                    f"All the columns in 'data' must have the same number of rows, however the first column had {num_rows} rows and column number {column_no + 1} had {len(column)} row(s)."
                 )
-        carriage_return = re.compile("\r")
-        tab = re.compile("\t")
-        out = []
-        for row in data:
+        gaps = []
+        hidden_widths = None
+        if self.windowed:
+            shown, gaps, hidden = self.window_ranges(num_rows)
+            if scan_hidden:
+                hidden_widths = [
+                    self.scan_widths(
+                        chain.from_iterable(
+                            clean_column(slice_column(column, start, stop))[0]
+                            for start, stop in hidden
+                        )
+                    )
+                    for column in columns
+                ]
             cleaned = []
-            for cell in row:
-                cell = str(cell)
-                cell = carriage_return.sub("", cell)
-                cell = tab.sub(" " * 4, cell)
-                cleaned.append(cell)
-            out.append(cleaned)
-        return out
+            for column in columns:
+                pieces = [clean_column(slice_column(column, start, stop)) for start, stop in shown]
+                cleaned.append(
+                    (
+                        list(chain.from_iterable(strings for strings, _ in pieces)),
+                        list(chain.from_iterable(lengths for _, lengths in pieces)),
+                    )
+                )
+        else:
+            cleaned = [clean_column(column) for column in columns]
+        columns = [strings for strings, _ in cleaned]
+        if not all(map(is_plain, columns)):
+            return labels, columns, None, gaps, hidden_widths
+        return labels, columns, [lengths for _, lengths in cleaned], gaps, hidden_widths
+
+    def window_ranges(
+        self, num_rows: int
+    ) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Works out which of `num_rows` rows are shown given `offset`, `limit`,
+        `head` and `tail`. Returns the (start, stop) ranges of the rows shown,
+        the gaps to mark as (rows shown before the gap, rows left out) and the
+        ranges of the rows that aren't shown.
+        """
+        start = min(self.offset, num_rows)
+        stop = num_rows if self.limit is None else min(num_rows, start + self.limit)
+        head, tail = self.head, self.tail
+        if head and tail and head + tail < stop - start:
+            shown = [(start, start + head), (stop - tail, stop)]
+        elif head and not tail:
+            shown = [(start, min(stop, start + head))]
+        elif tail and not head:
+            shown = [(max(start, stop - tail), stop)]
+        else:
+            shown = [(start, stop)]
+        gaps = []
+        hidden = []
+        shown_so_far = 0
+        previous_stop = 0
+        for range_start, range_stop in shown:
+            if range_start > previous_stop:
+                gaps.append((shown_so_far, range_start - previous_stop))
+            hidden.append((previous_stop, range_start))
+            shown_so_far += range_stop - range_start
+            previous_stop = range_stop
+        if previous_stop < num_rows:
+            gaps.append((shown_so_far, num_rows - previous_stop))
+        hidden.append((previous_stop, num_rows))
+        hidden = [(a, b) for a, b in hidden if a < b]
+        return shown, gaps, hidden
+
+    def window_rows(
+        self, data: Iterable[Sequence[Any]], scan_hidden: bool
+    ) -> Tuple[
+        Iterable[Sequence[Any]], List[Tuple[int, int]], Union[None, List[int]], Union[None, int]
+    ]:
+        """
+        Picks out the rows shown given `offset`, `limit`, `head` and `tail`
+        before any of them are cleaned. A list is simply sliced. Any other
+        iterable is read once, skipping the rows before the window, keeping
+        the last `tail` rows in a bounded queue and only counting the rows
+        that aren't shown, or measuring them if `scan_hidden` is set.
+
+        Returns the rows to render, the gaps to mark as (rows shown before the
+        gap, rows left out), if `scan_hidden` the width of the widest hidden
+        cell in each column, and the number of columns in the first row.
+        """
+        hidden_widths = [] if scan_hidden else None
+        if type(data) is list:
+            num_columns = len(data[0]) if data else None
+            shown, gaps, hidden = self.window_ranges(len(data))
+            if scan_hidden:
+                self.scan_row_widths(
+                    chain.from_iterable(data[start:stop] for start, stop in hidden),
+                    hidden_widths,
+                )
+            rows = list(chain.from_iterable(data[start:stop] for start, stop in shown))
+            return rows, gaps, hidden_widths, num_columns
+
+        def skip(skipped: Iterable[Sequence[Any]]) -> int:
+            if hidden_widths is None:
+                return sum(1 for _ in skipped)
+            return self.scan_row_widths(skipped, hidden_widths)
+
+        gaps = []
+
+        def mark_gap(position: int, count: int) -> None:
+            # rows left out next to each other share a single marker
+            if gaps and gaps[-1][0] == position:
+                gaps[-1] = (position, gaps[-1][1] + count)
+            elif count:
+                gaps.append((position, count))
+
+        head, tail, limit = self.head, self.tail, self.limit
+        rows = iter(data)
+        first_row = next(rows, None)
+        if first_row is None:
+            return [], [], hidden_widths, None
+        rows = chain([first_row], rows)
+        mark_gap(0, skip(islice(rows, self.offset)))
+        if not (head or tail or limit is not None):
+            # nothing bounds the window, so the rows are streamed if they can
+            # be, and otherwise gathered to plan the column widths from
+            if self.sample_size is None and self.column_widths is None:
+                rows = list(rows)
+            return rows, gaps, hidden_widths, len(first_row)
+        window = rows if limit is None else islice(rows, limit)
+        shown = list(islice(window, head)) if head else []
+        if tail:
+            if hidden_widths is None:
+                # numbering the rows lets the queue count them without a Python loop
+                kept = deque(zip(count(1), window), maxlen=tail)
+                elided = kept[0][0] - 1 if kept else 0
+                kept = [row for _, row in kept]
+            else:
+                kept = deque(maxlen=tail)
+                elided = 0
+                for row in window:
+                    if len(kept) == tail:
+                        elided += skip([kept[0]])
+                    kept.append(row)
+            mark_gap(len(shown), elided)
+            shown.extend(kept)
+        elif not head:
+            shown = list(window)
+        mark_gap(len(shown), skip(window) + skip(rows))
+        return shown, gaps, hidden_widths, len(first_row)
+
+    def scan_row_widths(self, rows: Iterable[Sequence[Any]], widths: List[int]) -> int:
+        """
+        Widens `widths` to fit every cell of `rows` without keeping any of the
+        rows around, returning the number of rows scanned.
+        """
+        num_rows = 0
+        rows = iter(rows)
+        # a chunk of rows at a time, measured one column at a time
+        for chunk in iter(lambda: list(islice(rows, SCAN_CHUNK_SIZE)), []):
+            num_rows += len(chunk)
+            for column_no, column in enumerate(zip(*chunk)):
+                width = max(map(self.cell_width, map(self.clean_cell, column)))
+                if column_no == len(widths):
+                    widths.append(width)
+                elif width > widths[column_no]:
+                    widths[column_no] = width
+        return num_rows
 
-    def filter_columns(self, data: Data, headers: Headers) -> Tuple[Data, Headers]:
+    def scan_widths(self, cells: Iterable[NonWrappedCell]) -> int:
+        return max(map(self.cell_width, cells), default=0)
+
+    def cell_width(self, cell: NonWrappedCell) -> int:
+        """
+        The natural width of a cleaned cell, only converting it when it could
+        be changed by patterns, color codes or new-lines.
+        """
+        if self.patterns or ESCAPE in cell or "\n" in cell:
+            return max(self.convert_cell(cell)[2])
+        return display_width(cell)
+
+    def check_row_length(self, row: Sequence[Any], num_columns: int, row_num: int) -> None:
+        if len(row) != num_columns:
+            raise ValueError(
+                f"All the rows in 'data' must have the same number of columns, however the first row had {num_columns} columns and row number {row_num + 1} had {len(row)} column(s)."
+            )
+
+    def split_sample(
+        self, data: Iterable[Sequence[Any]], sample_size: Union[None, int], strategy: str
+    ) -> Tuple[List[Sequence[Any]], Iterator[Sequence[Any]], int]:
+        """
+        Splits an arbitrary iterable of rows into the rows that column widths
+        will be planned from and an iterator over the rows that are streamed
+        through afterwards. Neither is cleaned yet, so that only the cells of
+        displayed columns ever are. Also returns the number of columns, which
+        is taken from the first row.
+        """
+        rows = iter(data)
+        first_row = next(rows, None)
+        if first_row is None:
+            raise TypeError("'data' must be an iterable of rows. Got an empty iterable")
+        num_columns = len(first_row)
+        rows = chain([first_row], rows)
+        if sample_size is None:
+            return [], self.check_rows(rows, num_columns), num_columns
+        if strategy == "head":
+            rest = self.check_rows(rows, num_columns)
+            return list(islice(rest, sample_size)), rest, num_columns
+        if strategy == "reservoir":
+            if iter(data) is data:
+                raise TypeError(
+                    "'sample_strategy=\"reservoir\"' reads 'data' twice, so it can't be a one-shot iterator."
+                )
+            sample = self.reservoir_sample(rows, sample_size, num_columns)
+            return sample, self.check_rows(data, num_columns), num_columns
+        raise ValueError(
+            f"'sample_strategy' must be either \"head\" or \"reservoir\". Got {strategy!r}"
+        )
+
+    def reservoir_sample(
+        self, rows: Iterable[Sequence[Any]], sample_size: int, num_columns: int
+    ) -> List[Sequence[Any]]:
+        """
+        Draws a uniform random sample of `sample_size` rows in a single pass
+        using reservoir sampling. The generator is seeded so that the same
+        data always produces the same table.
+        """
+        import random
+
+        rng = random.Random(0)
+        sample = []
+        for row_num, row in enumerate(rows):
+            self.check_row_length(row, num_columns, row_num)
+            if row_num < sample_size:
+                sample.append(row)
+            else:
+                index = rng.randint(0, row_num)
+                if index < sample_size:
+                    sample[index] = row
+        return sample
+
+    def filter_columns(self, columns: Columns, headers: Headers) -> Tuple[Columns, Headers]:
         """
         Drop columns that meet drop criteria, unless they have been
         explicitly selected.
         """
+        keep = self.columns_to_keep(columns, headers)
+        return [columns[i] for i in keep], [headers[i] for i in keep]
+
+    def columns_to_keep(
+        self, columns: Sequence[Sequence[Any]], headers: Headers, cleaned: bool = True
+    ) -> List[int]:
+        """
+        Returns the indices of the columns that should be displayed, in the
+        order they should be displayed. A column is dropped when every one of
+        its cells is in `drop`, so checking a column stops at the first cell
+        that isn't. Unless `cleaned`, cells are cleaned one by one as they are
+        checked.
+        """
         drop = set(self.drop)
-        select_patterns = [re.compile(pattern, re.I) for pattern in self.select]
+        select_patterns = self.select_patterns
         select = len(select_patterns) > 0
-        headers_out = []
-        columns_out = []
-        for header, column in zip(headers, zip(*data)):
+        keep = []
+        for column_no, header in enumerate(headers):
             if select:
                 for pattern in select_patterns:
                     if pattern.search(header):
-                        headers_out.append(header)
-                        columns_out.append(column)
+                        keep.append(column_no)
+            elif not drop:
+                keep.append(column_no)
             else:
-                freqs = frequencies(column)
-                if not set(freqs.keys()).issubset(drop):
-                    headers_out.append(header)
-                    columns_out.append(column)
-        rows_out = list(zip(*columns_out))
-        return rows_out, headers_out
-
-    def convert_data_to_logical_rows(self, full_data: Data) -> List[LogicalRow]:
-        """
-        Takes a list of lists of items. Returns a list of logical rows, where each logical
-        row is a list of lists, where each sub-list in a logical row is a physical row to be
-        printed to the screen. There will only be more than one phyical row in a logical
-        row if one of the columns wraps past one line. However, wrapping will be performed
-        in a later step, so this function always returns logical rows that only contain
-        one physical row which will be wrapped onto multiple physical rows later.
-        """
-        logical_rows = []
-        color_grid = []
-        for row in full_data:
-            cells_varying_lengths = []
-            color_row = []
-            for cell in row:
-                cell = self.apply_patterns(cell)
-                cell, color = self.strip_color(cell)
-                color_row.append(color)
-                lines = cell.split("\n")
-                cells_varying_lengths.append(lines)
-            cells = [
-                [cell_text or "" for cell_text in physical_row]
-                for physical_row in zip_longest(*cells_varying_lengths)
-            ]
-            logical_rows.append(cells)
-            color_grid.append(color_row)
-        self.color_grid = color_grid
-        return logical_rows
+                cells = columns[column_no]
+                if not cleaned:
+                    cells = map(self.clean_cell, cells)
+                if not all(map(drop.__contains__, cells)):
+                    keep.append(column_no)
+        return keep
+
+    def project_rows(
+        self, rows: Iterator[Sequence[Any]], keep: List[int]
+    ) -> Iterator[List[NonWrappedCell]]:
+        """
+        Picks the displayed cells out of each row, cleaning only those.
+        """
+        if keep:
+            clean_cell = self.clean_cell
+            for row in rows:
+                yield [clean_cell(row[i]) for i in keep]
+
+    def convert_data_to_logical_rows(
+        self, columns: Columns, cell_cache: Union[None, CellCache] = None
+    ) -> ColumnData:
+        """
+        Takes the cleaned cells, one list per column, and splits every cell into
+        the lines it occupies, applying patterns and stripping color codes
+        along the way. There will only be more than one line in a cell if the
+        cell contains new-lines, wrapping is performed in a later step. The
+        result stays column oriented, along with the color codes stripped from
+        each cell and the display width of every line. With a `cell_cache`
+        repeated cells are only converted once.
+        """
+        cells = []
+        colors = []
+        widths = []
+        for column in columns:
+            column_cells = []
+            column_colors = []
+            column_widths = []
+            for cell in column:
+                if cell_cache is None:
+                    lines, color, line_widths = self.convert_cell(cell)
+                else:
+                    key = (self, cell)
+                    converted = cell_cache.get(key)
+                    if converted is None:
+                        converted = self.convert_cell(cell)
+                        cell_cache.put(key, converted)
+                    lines, color, line_widths = converted
+                column_cells.append(lines)
+                column_colors.append(color)
+                column_widths.append(line_widths)
+            cells.append(column_cells)
+            colors.append(column_colors)
+            widths.append(column_widths)
+        return ColumnData(cells, colors, widths)
+
+    def plain_column_data(
+        self, columns: Columns, cell_widths: List[List[int]]
+    ) -> ColumnData:
+        """
+        Builds the column data for cells known to be plain printable ASCII
+        with no patterns to apply, using widths that were already measured.
+        Such cells never contain new-lines or color codes, so each cell is a
+        single line.
+        """
+        return ColumnData(
+            [[[cell] for cell in column] for column in columns],
+            [[None] * len(column) for column in columns],
+            [[[width] for width in column] for column in cell_widths],
+        )
+
+    def convert_row_to_logical_row(
+        self, row: List[NonWrappedCell]
+    ) -> Tuple[LogicalRow, ColorRow, LogicalRowWidths]:
+        """
+        Converts a single row into a logical row, returning it along with the
+        color codes that were stripped from each of its cells and the display
+        width of every line in the logical row.
+        """
+        cells = []
+        color_row = []
+        widths = []
+        for cell in row:
+            lines, color, line_widths = self.convert_cell(cell)
+            cells.append(lines)
+            color_row.append(color)
+            widths.append(line_widths)
+        return cells, color_row, widths
+
+    def convert_cell(
+        self, cell: NonWrappedCell
+    ) -> Tuple[Cell, Union[None, str], CellWidths]:
+        """
+        Applies patterns to a cell, strips its color codes and splits it into
+        lines. The display width of each line is measured here, once, and reused
+        when sizing columns, wrapping and justifying.
+        """
+        if self.patterns:
+            cell = self.apply_patterns(cell)
+        if ESCAPE in cell:
+            cell, color = self.strip_color(cell)
+        else:
+            color = None
+        lines = cell.split("\n")
+        return lines, color, list(map(display_width, lines))
 
     def apply_patterns(self, cell_text):
-        out_text = cell_text
-        for pattern, func in self.patterns:
-            if pattern.match(cell_text):
-                out_text = func(cell_text)
-                break
-        return out_text
+        dispatcher = self.pattern_dispatcher
+        if dispatcher is None:
+            for pattern, func in self.patterns:
+                if pattern.match(cell_text):
+                    return func(cell_text)
+            return cell_text
+        match = dispatcher.match(cell_text)
+        if match is None:
+            return cell_text
+        return self.pattern_functions[match.lastgroup](cell_text)
+
+    def pattern_matched(self, cell_text: str) -> bool:
+        """
+        True when one of the patterns applies to the cell.
+        """
+        if self.pattern_dispatcher is None:
+            return any(pattern.match(cell_text) for pattern, _ in self.patterns)
+        return self.pattern_dispatcher.match(cell_text) is not None
+
+    def count_converted_cells(self, columns: Columns, stats: RenderStats) -> None:
+        """
+        Adds the cells that column widths are planned from to `stats`. Which
+        of them matched a pattern is worked out here rather than while they're
+        converted, so that conversion costs nothing extra without stats.
+        """
+        num_cells = sum(map(len, columns))
+        stats.cells += num_cells
+        stats.planned_rows = max(stats.planned_rows, len(columns[0]) if columns else 0)
+        stats.planned_cells = max(stats.planned_cells, num_cells)
+        if self.patterns:
+            hits = sum(sum(map(self.pattern_matched, column)) for column in columns)
+            stats.pattern_hits += hits
+            stats.pattern_misses += num_cells - hits
+
+    def count_streamed_rows(
+        self, rows: Iterator[List[NonWrappedCell]], stats: RenderStats
+    ) -> Iterator[List[NonWrappedCell]]:
+        """
+        Adds the cells of rows streamed through after column widths have been
+        planned to `stats` as they go by.
+        """
+        for row in rows:
+            stats.cells += len(row)
+            if self.patterns:
+                hits = sum(map(self.pattern_matched, row))
+                stats.pattern_hits += hits
+                stats.pattern_misses += len(row) - hits
+            yield row
+
+    def count_wrapped_lines(
+        self,
+        rows: Iterator[Tuple[LogicalRow, ColorRow, LogicalRowWidths]],
+        column_widths: List[int],
+        stats: RenderStats,
+    ) -> Iterator[Tuple[LogicalRow, ColorRow, LogicalRowWidths]]:
+        for row in rows:
+            stats.wrapped_lines += sum(
+                width > column_width
+                for cell_widths, column_width in zip(row[2], column_widths)
+                for width in cell_widths
+            )
+            yield row
 
     def strip_color(self, cell_text):
-        matches = [match for match in self.ansi_color_pattern.finditer(cell_text)]
-        color_codes = None
-        clean_text = cell_text
-        if matches:
-            clean_text = self.ansi_color_pattern.sub("", cell_text)
-            color_codes = "".join([match.group(0) for match in matches[:-1]])
-        return clean_text, color_codes
-
-    def distribute_between(self, diff: int, columns: List[dict], n: int) -> List[dict]:
-        """
-        Reduces the total width of the n widest columns by 'diff', returning
-        the list of columns such that the first n columns are now all the 
-        same width. This function will continue to be called as long as the nth 
-        column is narrower than the n+1 th column, meaning that we could still
-        distribute our 'diff' more equally among the widest columns.
-        """
-        subset = columns[:n]
-        width = sum([column["width"] for column in subset])
-        remainder = width - diff
-        new_width = remainder // n
-        for i in range(n):
-            columns[i]["width"] = new_width
-        return columns
-
-    def widths_sorted_by(self, columns: List[dict], key: str) -> List[int]:
-        return [column["width"] for column in sorted(columns, key=lambda x: x[key])]
-
-    def current_table_width(self, columns: List[dict]) -> int:
-        return sum(
-            [len(self.column_sep) + column["width"] for column in columns]
-        ) + len(self.column_sep)
-
-    def get_column_widths(self, logical_rows: List[LogicalRow]) -> List[int]:
+        """
+        Splits the color codes out of a cell in a single scan, returning the
+        clean text along with every code but the last, which is assumed to
+        be the reset.
+        """
+        parts = self.ansi_color_pattern.split(cell_text)
+        if len(parts) == 1:
+            return cell_text, None
+        return "".join(parts[::2]), "".join(parts[1:-2:2])
+
+    def natural_column_widths(self, column_data: ColumnData) -> List[int]:
+        """
+        Returns the display width of the widest line in each column. Since the
+        data is stored by column this is a single pass over each column's
+        widths, without building any intermediate copy of the table.
+        """
+        return [max(map(max, column), default=0) for column in column_data.widths]
+
+    def clamp_column_width(self, width: int) -> int:
+        # apply min and max widths
+        if width < self.min_column_width:
+            width = self.min_column_width
+        if self.max_column_width and width > self.max_column_width:
+            width = self.max_column_width
+        return width
+
+    def get_column_widths(
+        self, natural_widths: List[int], terminal_width: int
+    ) -> List[int]:
         """
         Calculated column widths, taking into account the terminal width,
         the number of columns, and the column seperators that will be used
@@ -287,133 +1532,175 @@ class Columnar:
         the wide columns down to the width of the narrow columns and the table is still
         too wide to fit in the display.
 
-        The function we will utilize to determine our column widths is
-        'self.distribute_between'. It has three arguments:
-        1. 'diff' is the size by which we need to shrink the table to get it 
-        to fit in the terminal. 
-        2. 'columns' is a list of dictionaries that
-        represent the columns in the table, sorted from widest to narrowest.
-        3. 'n' is the number of columns whose size will be reduced to reduce the table
-        size by a total of 'diff'.
-        The first time distribute_between is called n will be 1 and
-        'diff' will be a positive value and the first/largest column's width will be 
-        reduced by 'diff'. 
-
-        Often the state of our table after the first call to 
-        distribute_between does not follow our heuristic since the widest column is now 
-        narrower, potentially much narrower, than the next widest column. (More formally speaking,
-        the nth column is now narrower than the n+1 th column keeping in mind that the columns
-        are sorted from widest to narrowest). It would be more
-        desirable to shrink several wide columns a little bit than to shrink one column a lot.
-        So, to "shrink several wide columns a little bit" we will
-        redistribute the original "diff" amount between the widest columns. We will determine
-        the number of columns to split the "diff" between by calling distribute_between 
-        multiple times and adding the next-largest column into the group that shares the "diff". 
-        After each call we will check if column n+1 is wider than the first n
-        columns (which will all be the same width), and if so we will call distribute_between 
-        again to ensure that we are shrinking columns equitably. Once column number n+1 is narrower 
-        than the first n columns we are done.
-
-        So starting with the second call to distribute_between 'diff' will be 0, but n will increase
-        by one each call, meaning that the origial 'diff' amount will get distributed between a 
-        larger number of columns each round until we either manage to get a table that fits and 
-        preserves the order of column sizes, or we have exhausted our columns as we throw a 
-        TableOverflowError.
-        """
+        This is water-filling: with the columns sorted from widest to narrowest,
+        the n widest columns are all cut down to the same width, the "cap", and
+        the rest keep their natural widths. The cap for a given n is whatever
+        space is left once the separators and the untouched narrower columns
+        have been paid for, split evenly between the n widest columns and
+        rounded down:
+
+            cap(n) = (terminal_width - separators - sum(widths[n:])) // n
 
+        We want the smallest n whose cap is at least as wide as the widest
+        column left untouched, column n+1, since any smaller n would leave the
+        shrunken columns narrower than a column that wasn't shrunk at all.
+        Sorting the columns once and keeping a running sum of the untouched
+        widths lets us try every n in a single pass. If the cap for that n is
+        below `min_column_width` more columns are brought in, and if none of
+        them fit we raise a TableOverflowError.
+        """
+        max_column_width = self.max_column_width
+        min_column_width = self.min_column_width
         max_widths = []
-        for column in zip(*reduce(operator.add, logical_rows)):
-            lengths = [len(cell) for cell in column]
-            max_natural = max(lengths)
+        for max_natural in natural_widths:
             max_width = (
                 max_natural
-                if self.max_column_width == None
-                else min(max_natural, self.max_column_width)
+                if max_column_width == None
+                else min(max_natural, max_column_width)
             )
             max_widths.append(max_width)
 
-        columns = sorted(
-            [{"column_no": no, "width": width} for no, width in enumerate(max_widths)],
-            key=lambda x: x["width"],
-            reverse=True,
-        )
-        # apply min and max widths
-        for column in columns:
-            if column["width"] < self.min_column_width:
-                column["width"] = self.min_column_width
-            if self.max_column_width:
-                if column["width"] > self.max_column_width:
-                    column["width"] = self.max_column_width
+        # widest first, columns of equal width stay in their original order
+        order = sorted(range(len(max_widths)), key=max_widths.__getitem__, reverse=True)
+        widths = list(map(self.clamp_column_width, max_widths))
 
-        if self.current_table_width(columns) <= self.terminal_width:
-            return self.widths_sorted_by(columns, "column_no")
+        available = terminal_width - (len(widths) + 1) * len(self.column_sep)
+        untouched = sum(widths)
+        if untouched <= available:
+            return widths
 
         # the table needs to be narrowed
-        for i in range(len(columns)):
-            # include the next largest column in the size reduction
-            diff = self.current_table_width(columns) - self.terminal_width
-            columns = self.distribute_between(diff, columns, i + 1)
-            if i < len(columns) - 1 and columns[0]["width"] < columns[i + 1]["width"]:
-                # if the columns that were just shrunk are smaller than the next largest column,
-                # keep distributing the size so we have evenly-shrunken columns
+        for n, column_no in enumerate(order, 1):
+            untouched -= widths[column_no]
+            cap = (available - untouched) // n
+            if n < len(order) and cap < widths[order[n]]:
+                # the columns that were just shrunk would be narrower than the next
+                # largest column, so it has to share the reduction
                 continue
-            elif (
-                columns[0]["width"] >= self.min_column_width
-                and self.current_table_width(columns) <= self.terminal_width
-            ):
-                return self.widths_sorted_by(columns, "column_no")
+            if cap >= min_column_width:
+                for shrunk in order[:n]:
+                    widths[shrunk] = cap
+                return widths
 
         raise TableOverflowError(
             "Could not fit table in current terminal, try reducing the number of columns."
         )
 
     def wrap_and_truncate_logical_cells(
-        self, logical_rows: List[LogicalRow], column_widths: List[int]
-    ) -> List[LogicalRow]:
-        lrows_out = []
-        for lrow in logical_rows:
-            cells_out = []
-            for cell, width in zip(map(list, zip(*lrow)), column_widths):
-                # at this point `cell` is a list of strings, representing each line of the cell's contents
-                cell_out = []
-                for line in cell:
-                    # Get the line width accounting for characters that occupy two terminal columns
-                    # e.g. Unicode code point U+1F32D has a visual width of 2
-                    while wcswidth(line) > width:
-                        wrap_index = width
-                        while wcswidth(line[:wrap_index]) > width:
-                            # decrease the number of characters on the line until the 
-                            # visual width is <= width.
-                            wrap_index -= 1
-                        cell_out.append(line[:wrap_index])
-                        line = line[wrap_index:]
-                    cell_out.append(line)
-                cells_out.append(cell_out[: self.wrap_max + 1])
-            cells_out_padded = [
-                [text or "" for text in line] for line in zip_longest(*cells_out)
-            ]
-            lrows_out.append(cells_out_padded)
-        return lrows_out
+        self,
+        logical_rows: List[LogicalRow],
+        column_widths: List[int],
+        width_grid: List[LogicalRowWidths],
+    ) -> List[Tuple[LogicalRow, LogicalRowWidths]]:
+        return [
+            self.wrap_and_truncate_logical_row(lrow, column_widths, lrow_widths)
+            for lrow, lrow_widths in zip(logical_rows, width_grid)
+        ]
 
-    def visual_justify(self, text: str, width: int, alignment: str) -> str:
+    def wrap_and_truncate_logical_row(
+        self, lrow: LogicalRow, column_widths: List[int], lrow_widths: LogicalRowWidths
+    ) -> Tuple[LogicalRow, LogicalRowWidths]:
+        """
+        Wraps every line in the logical row to fit its column, returning the
+        wrapped logical row along with the display width of each of its lines.
+        Lines that already fit keep the width measured when the logical row was
+        created, only the pieces of wrapped lines are measured again.
+        """
+        return wrap_logical_row(
+            lrow, column_widths, lrow_widths, self.wrap_max + 1, self.wrap_mode
+        )
+
+    def visual_justify(
+        self, text: str, width: int, alignment: str, text_width: Union[None, int] = None
+    ) -> str:
         """
         The default python string methods, ljust, center, and rjust check
         the string length using len(), which adds too many spaces when the 
         string includes characters with a visual length of 2. We need to
-        implement our own justification methods to handle this.
-        """
-        text_width = wcswidth(text)
-        diff = width - text_width
-        if alignment == 'l':
-            right_padding = " " * diff
-            return text + right_padding
-        elif alignment == 'c':
-            left_length = (diff // 2)
-            left_padding = " " * left_length
-            right_padding = " " * (diff - left_length)
-            return ''.join([left_padding, text, right_padding])
-        elif alignment == 'r':
-            left_padding = " " * diff
-            return left_padding + text
-        else:
+        implement our own justification methods to handle this. If the
+        display width of `text` is already known it can be passed as
+        `text_width` to avoid measuring it again.
+        """
+        if alignment not in JUSTIFIERS:
             raise ValueError(f"Got invalid justification value: {alignment}")
+        if text_width is None:
+            text_width = display_width(text)
+        return JUSTIFIERS[alignment](text, width, text_width)
+
+
+def rows_from_event_loop(
+    rows: AsyncIterable[Sequence[Any]], loop: Any
+) -> Iterator[Sequence[Any]]:
+    """
+    Iterates over an async iterable from a thread other than the event
+    loop's, waiting for the loop to fetch each row.
+    """
+    import asyncio
+
+    iterator = rows.__aiter__()
+
+    async def next_row():
+        return await iterator.__anext__()
+
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(next_row(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+def close_after(future: "asyncio.Future", lines: Iterator[str]) -> None:
+    """
+    Closes `lines` once the chunk that `future` was rendering from them is
+    finished, retrieving its exception so it isn't reported as unhandled.
+    """
+    if not future.cancelled():
+        future.exception()
+    lines.close()
+
+
+def write_to_descriptor(fd: int, chunk: bytes) -> None:
+    """
+    Writes all of `chunk` to a file descriptor, which may accept less than
+    the whole of it at a time, e.g. when it's a pipe.
+    """
+    view = memoryview(chunk)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+@lru_cache(maxsize=1)
+def terminal_columns() -> int:
+    import shutil
+
+    return shutil.get_terminal_size().columns
+
+
+@lru_cache(maxsize=RENDERER_CACHE_SIZE)
+def configured_renderer(key: Tuple[type, Tuple[Tuple[str, Any], ...]]) -> Columnar:
+    cls, options = key
+    return cls(**dict(options))
+
+
+def render_chunk(
+    options: dict,
+    column_widths: List[int],
+    chunk: List[Tuple[LogicalRow, ColorRow, LogicalRowWidths]],
+) -> List[str]:
+    """
+    Renders a chunk of logical rows in a worker process, returning the
+    physical lines including the separators that follow each row.
+    """
+    renderer = Columnar(**options)
+    justifications = renderer.justifications_for(len(column_widths))
+    separator = None if renderer.no_borders else renderer.row_separator_line(column_widths)
+    lines = []
+    for lrow, color_row, lrow_widths in chunk:
+        lines.extend(
+            renderer.render_logical_row(
+                lrow, color_row, lrow_widths, column_widths, justifications
+            )
+        )
+        if separator is not None:
+            lines.append(separator)
+    return lines
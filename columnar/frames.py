@@ -0,0 +1,87 @@
+"""
+Bulk conversion of column-oriented input, i.e. pandas DataFrames, NumPy
+arrays and dicts of columns, into the cleaned strings Columnar renders.
+
+Neither pandas nor NumPy is a dependency. If a DataFrame or an array is
+passed in then its library has already been imported by the caller, so the
+modules are looked up in `sys.modules` rather than imported here.
+"""
+import sys
+from typing import Any, List, Tuple, Union
+
+
+def is_column_oriented(data: Any) -> bool:
+    if isinstance(data, dict):
+        return True
+    pandas = sys.modules.get("pandas")
+    if pandas is not None and isinstance(data, pandas.DataFrame):
+        return True
+    numpy = sys.modules.get("numpy")
+    return numpy is not None and isinstance(data, numpy.ndarray)
+
+
+def split_columns(data: Any) -> Tuple[Union[None, List[str]], List[Any]]:
+    """
+    Returns the column labels, or None for an array which has none, along
+    with the columns themselves.
+    """
+    if isinstance(data, dict):
+        return [str(label) for label in data], list(data.values())
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and isinstance(data, numpy.ndarray):
+        if data.ndim != 2:
+            raise TypeError(
+                f"'data' must be a two dimensional array. Got an array with {data.ndim} dimension(s)"
+            )
+        return None, list(data.T)
+    return (
+        [str(label) for label in data.columns],
+        [data.iloc[:, column_no] for column_no in range(data.shape[1])],
+    )
+
+
+def slice_column(column: Any, start: int, stop: int) -> Any:
+    """
+    Returns the cells of a column from position `start` up to `stop`.
+    """
+    pandas = sys.modules.get("pandas")
+    if pandas is not None and isinstance(column, pandas.Series):
+        return column.iloc[start:stop]
+    return column[start:stop]
+
+
+def clean_column(column: Any) -> Tuple[List[str], List[int]]:
+    """
+    Converts every cell in the column to a string, removing carriage returns
+    and replacing tabs with four spaces, and returns the strings along with
+    their lengths. pandas Series and NumPy arrays are converted with their own
+    vectorized string operations rather than one cell at a time.
+    """
+    pandas = sys.modules.get("pandas")
+    numpy = sys.modules.get("numpy")
+    if pandas is not None and isinstance(column, pandas.Series):
+        # astype(str) keeps missing values as NaN in recent versions of pandas,
+        # map(str) matches what str() gives for every other kind of input
+        strings = (
+            column.map(str)
+            .str.replace("\r", "", regex=False)
+            .str.replace("\t", " " * 4, regex=False)
+        )
+        return strings.tolist(), strings.str.len().tolist()
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        strings = numpy.char.replace(
+            numpy.char.replace(column.astype(str), "\r", ""), "\t", " " * 4
+        )
+        return strings.tolist(), numpy.char.str_len(strings).tolist()
+    strings = [str(cell).replace("\r", "").replace("\t", " " * 4) for cell in column]
+    return strings, list(map(len, strings))
+
+
+def is_plain(strings: List[str]) -> bool:
+    """
+    True when every string is made up of printable ASCII, meaning there are
+    no wide characters, new-lines or color codes and a cell's length is its
+    display width. The check is done on the whole column at once.
+    """
+    joined = "".join(strings)
+    return joined.isascii() and joined.isprintable()
@@ -0,0 +1,148 @@
+"""
+The per-row inner loops of rendering: wrapping a logical row to its column
+widths, and justifying, colorizing and joining its physical lines.
+
+This module and `columnar.width` are fully typed so that they can be
+compiled with mypyc, see `setup.py`. A compiled build is picked up in place
+of the source automatically, and when there isn't one the source is simply
+imported as it is. Both have to behave identically, which
+`tests/test_kernels.py` checks.
+"""
+from itertools import zip_longest
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+from .width import wrap_line_widths
+
+Justifier = Callable[[str, int, int], str]
+
+
+def compiled() -> bool:
+    """
+    True when this module has been compiled rather than imported from source.
+    """
+    return not __file__.endswith(".py")
+
+
+class Padding(Dict[int, str]):
+    """
+    Runs of spaces keyed by their length. Each length is built the first
+    time it's needed and shared by every cell justified with it afterwards.
+    """
+
+    def __missing__(self, length: int) -> str:
+        padding = self[length] = " " * length
+        return padding
+
+
+PADDING = Padding()
+
+
+def justify_left(text: str, width: int, text_width: int) -> str:
+    return text + PADDING[width - text_width]
+
+
+def justify_center(text: str, width: int, text_width: int) -> str:
+    diff = width - text_width
+    left_length = diff // 2
+    return f"{PADDING[left_length]}{text}{PADDING[diff - left_length]}"
+
+
+def justify_right(text: str, width: int, text_width: int) -> str:
+    return PADDING[width - text_width] + text
+
+
+JUSTIFIERS: Dict[str, Justifier] = {"l": justify_left, "c": justify_center, "r": justify_right}
+
+
+def wrap_logical_row(
+    lrow: Sequence[Sequence[str]],
+    column_widths: Sequence[int],
+    lrow_widths: Sequence[Sequence[int]],
+    max_lines: int,
+    mode: str = "char",
+) -> Tuple[List[Sequence[str]], List[Sequence[int]]]:
+    """
+    Wraps every line in the logical row to fit its column, in the given wrap
+    `mode`, keeping at most `max_lines` lines of each cell, and returns the
+    wrapped logical row along with the display width of each of its lines.
+    Lines that already fit keep the width measured when the logical row was
+    created, only the pieces of wrapped lines are measured again. Wrapping a
+    cell stops as soon as it has `max_lines` lines.
+    """
+    # every cell spans as many lines as the tallest cell in the row, the
+    # blank lines of shorter cells are wrapped along with the rest
+    height = 0
+    for cell in lrow:
+        if len(cell) > height:
+            height = len(cell)
+    cells_out: List[Sequence[str]] = []
+    widths_out: List[Sequence[int]] = []
+    for cell, cell_widths, width in zip(lrow, lrow_widths, column_widths):
+        if len(cell) == height and max(cell_widths, default=0) <= width:
+            # nothing to pad or wrap
+            cells_out.append(cell[:max_lines])
+            widths_out.append(cell_widths[:max_lines])
+            continue
+        lines = list(cell)
+        line_widths = list(cell_widths)
+        if len(lines) < height:
+            padding = height - len(lines)
+            lines.extend([""] * padding)
+            line_widths.extend([0] * padding)
+        cell_out: List[str] = []
+        cell_widths_out: List[int] = []
+        for line, line_width in zip(lines, line_widths):
+            if len(cell_out) >= max_lines:
+                break
+            if line_width <= width:
+                cell_out.append(line)
+                cell_widths_out.append(line_width)
+            else:
+                # Wrap on the line's display width rather than its length since some
+                # characters occupy two terminal columns, e.g. Unicode code point U+1F32D
+                pieces, piece_widths = wrap_line_widths(
+                    line, width, line_width, max_lines - len(cell_out), mode
+                )
+                cell_out.extend(pieces)
+                cell_widths_out.extend(piece_widths)
+        cells_out.append(cell_out)
+        widths_out.append(cell_widths_out)
+    return cells_out, widths_out
+
+
+def join_physical_lines(
+    cells: Sequence[Sequence[str]],
+    cell_widths: Sequence[Sequence[int]],
+    column_widths: Sequence[int],
+    justifications: Sequence[Justifier],
+    color_row: Sequence[Union[None, str]],
+    column_sep: str,
+    color_reset: str,
+) -> List[str]:
+    """
+    Transposes a wrapped logical row into its physical lines, justifying
+    each cell to its column's width, wrapping it in its color code if it has
+    one, and joining the cells with `column_sep`.
+    """
+    line_end = column_sep + "\n"
+    colored = False
+    for code in color_row:
+        if code is not None:
+            colored = True
+    lines: List[str] = []
+    for row, row_widths in zip(
+        zip_longest(*cells, fillvalue=""), zip_longest(*cell_widths, fillvalue=0)
+    ):
+        parts = [
+            justifier(text, width, text_width)
+            for justifier, text, width, text_width in zip(
+                justifications, row, column_widths, row_widths
+            )
+        ]
+        if colored:
+            parts = [
+                part if code is None else f"{code}{part}{color_reset}"
+                for part, code in zip(parts, color_row)
+            ]
+        lines.append(f"{column_sep}{column_sep.join(parts)}{line_end}")
+    return lines
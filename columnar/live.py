@@ -0,0 +1,208 @@
+"""
+Incremental rendering for tables that are redrawn over and over, such as a
+`top`-like dashboard that refreshes every second while only a few of its
+cells change.
+"""
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+from .columnar import Columnar, ColorRow, LogicalRow, LogicalRowWidths
+
+
+class LiveTable:
+    """
+    Keeps the column widths and the rendered lines of every row from one
+    frame to the next. Each call to `update` only converts and wraps the
+    rows that changed, and column widths are only planned again when the
+    widest cell of a column changes or the terminal is resized, in which
+    case every row is re-wrapped from the logical rows kept from earlier
+    frames.
+
+    A frame is identical to what `columnar(data, headers, **options)` renders
+    for the same data. `drop` isn't supported since whether a column is
+    dropped depends on every row, and neither are the options that change
+    which rows are rendered or how, `head`, `tail`, `offset`, `limit`,
+    `paging`, `sample_size` and `workers`. Passing any of them raises a
+    ValueError.
+    """
+
+    def __init__(
+        self,
+        headers: Union[None, Sequence[Any]] = None,
+        renderer: Union[None, Columnar] = None,
+        **options,
+    ) -> None:
+        renderer = (renderer or Columnar()).configure(**options)
+        if renderer.drop:
+            raise ValueError("'drop' isn't supported by LiveTable, use 'select' instead.")
+        if renderer.windowed:
+            raise ValueError("'head', 'tail', 'offset' and 'limit' aren't supported by LiveTable.")
+        if renderer.paging:
+            raise ValueError("'paging' isn't supported by LiveTable.")
+        if renderer.sample_size is not None:
+            raise ValueError("'sample_size' isn't supported by LiveTable.")
+        if renderer.workers > 1:
+            raise ValueError("'workers' isn't supported by LiveTable.")
+        self.renderer = renderer
+        self.headers = None if headers is None else list(headers)
+        self.num_columns = None
+        self.keep = None
+        self.header_row = None
+        # per row: the cleaned cells, the logical row, the natural width of
+        # each cell and the rendered lines
+        self.rows: List[Union[None, List[str]]] = []
+        self.logical_rows: List[Tuple[LogicalRow, ColorRow, LogicalRowWidths]] = []
+        self.natural_rows: List[List[int]] = []
+        self.rendered: List[List[str]] = []
+        # the number of cells of each natural width in every column, so a
+        # column's widest cell is known without rescanning it when it shrinks
+        self.width_counts: List[Dict[int, int]] = []
+        self.natural_widths = None
+        self.terminal_width = None
+        self.column_widths: List[int] = []
+        self.row_separator = None
+        self.header_lines: List[str] = []
+        self.lines: List[str] = []
+
+    @property
+    def num_lines(self) -> int:
+        return len(self.lines)
+
+    def frame(self) -> str:
+        """
+        Returns the whole of the most recently rendered frame.
+        """
+        return "".join(self.lines)
+
+    def update(self, data: Sequence[Sequence[Any]]) -> List[Tuple[int, str]]:
+        """
+        Renders the next frame from `data` and returns the lines that differ
+        from the previous frame as (line number, line) pairs, every line for
+        the first frame. If the new frame is shorter than the previous one the
+        lines from `num_lines` onwards are no longer part of the table.
+        """
+        renderer = self.renderer
+        data = list(data)
+        if self.num_columns is None and (data or self.headers is not None):
+            # without headers the number of columns isn't known until a
+            # frame has rows
+            self.start(len(data[0]) if data else len(self.headers))
+        rows = [
+            [row[i] for i in self.keep]
+            for row in renderer.clean_rows(data, self.num_columns)
+        ] if data else []
+
+        for natural in self.natural_rows[len(rows):]:
+            self.count_widths(natural, -1)
+        for state in (self.rows, self.logical_rows, self.natural_rows, self.rendered):
+            del state[len(rows):]
+            state.extend([None] * (len(rows) - len(state)))
+
+        changed = []
+        for row_no, row in enumerate(rows):
+            if self.rows[row_no] == row:
+                continue
+            if self.natural_rows[row_no] is not None:
+                self.count_widths(self.natural_rows[row_no], -1)
+            logical_row = renderer.convert_row_to_logical_row(row)
+            natural = [max(widths) for widths in logical_row[2]]
+            self.count_widths(natural, 1)
+            self.rows[row_no] = row
+            self.logical_rows[row_no] = logical_row
+            self.natural_rows[row_no] = natural
+            changed.append(row_no)
+
+        if self.plan_column_widths():
+            changed = range(len(rows))
+        for row_no in changed:
+            self.rendered[row_no] = self.render_row(self.logical_rows[row_no])
+
+        lines = [self.row_separator, *self.header_lines]
+        for row_lines in self.rendered:
+            lines.extend(row_lines)
+        previous = self.lines
+        self.lines = lines
+        return [
+            (line_no, line)
+            for line_no, line in enumerate(lines)
+            if line_no >= len(previous) or previous[line_no] != line
+        ]
+
+    def start(self, num_columns: int) -> None:
+        """
+        Works out which columns are displayed and measures the headers, which
+        stay the same from frame to frame.
+        """
+        renderer = self.renderer
+        headers = [""] * num_columns if self.headers is None else self.headers
+        if renderer.no_borders and not renderer.preformatted_headers:
+            headers = [text.upper() for text in headers]
+        keep = renderer.columns_to_keep([], headers)
+        column_widths = renderer.column_widths
+        if column_widths is not None and len(column_widths) != len(keep):
+            raise ValueError(
+                f"'column_widths' must have one width for each of the {len(keep)} displayed columns, got {len(column_widths)}."
+            )
+        self.num_columns = num_columns
+        self.keep = keep
+        self.width_counts = [{} for _ in self.keep]
+        if self.headers is not None:
+            self.header_row = renderer.convert_row_to_logical_row(
+                [headers[i] for i in self.keep]
+            )
+            self.count_widths([max(widths) for widths in self.header_row[2]], 1)
+
+    def count_widths(self, natural: List[int], change: int) -> None:
+        for counts, width in zip(self.width_counts, natural):
+            count = counts.get(width, 0) + change
+            if count:
+                counts[width] = count
+            else:
+                del counts[width]
+
+    def plan_column_widths(self) -> bool:
+        """
+        Plans the column widths again if the widest cell of any column or the
+        terminal width has changed, returning True when the widths change.
+        """
+        renderer = self.renderer
+        natural_widths = [max(counts, default=0) for counts in self.width_counts]
+        terminal_width = renderer.refresh_terminal_width()
+        if natural_widths == self.natural_widths and terminal_width == self.terminal_width:
+            return False
+        first_frame = self.natural_widths is None
+        self.natural_widths = natural_widths
+        self.terminal_width = terminal_width
+        if renderer.column_widths is not None:
+            column_widths = list(renderer.column_widths)
+        else:
+            column_widths = renderer.get_column_widths(natural_widths, terminal_width)
+        if column_widths == self.column_widths and not first_frame:
+            return False
+        self.column_widths = column_widths
+        self.row_separator = renderer.row_separator_line(column_widths)
+        self.header_lines = []
+        if self.header_row is not None:
+            self.header_lines.extend(
+                renderer.render_logical_row(
+                    *self.header_row,
+                    column_widths,
+                    renderer.justifications_for(len(column_widths)),
+                )
+            )
+            self.header_lines.append(renderer.header_separator_line(column_widths))
+        return True
+
+    def render_row(
+        self, logical_row: Tuple[LogicalRow, ColorRow, LogicalRowWidths]
+    ) -> List[str]:
+        renderer = self.renderer
+        lines = list(
+            renderer.render_logical_row(
+                *logical_row,
+                self.column_widths,
+                renderer.justifications_for(len(self.column_widths)),
+            )
+        )
+        if not renderer.no_borders:
+            lines.append(self.row_separator)
+        return lines
@@ -0,0 +1,102 @@
+"""
+Opt-in instrumentation of how the time and work of rendering a table are
+spread across its stages.
+"""
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, Union
+
+STAGES = ("clean", "filter", "convert", "plan", "emit")
+
+
+class RenderStats:
+    """
+    Collects per-stage wall time and counters while tables are rendered.
+    Pass one to `columnar()`, `render()`, `iter_lines()`, `write()` or
+    `render_to()` as `stats`; without one nothing is measured. The stages
+    are:
+
+        clean    converting cells to strings and checking the rows
+        filter   choosing the columns to display with `select` and `drop`
+        convert  applying patterns, stripping color codes and measuring cells
+        plan     working out the column widths
+        emit     wrapping, justifying and joining the rows into lines,
+                 including converting rows that are streamed rather than
+                 planned from
+
+    The counters are the number of cells converted, the number of those that
+    matched one of the `patterns`, the number of lines that were wider than
+    their column and had to be wrapped and the number of physical lines
+    emitted. `planned_rows` and `planned_cells` are the largest number of
+    rows and cells held in memory to plan column widths from. Cells rendered
+    straight from a `cell_cache` aren't converted, so they aren't counted.
+
+    Measurements add up over every table rendered with the same stats.
+    `callback`, if given, is called with the stats each time a table is
+    finished, e.g. to hand them to a metrics pipeline.
+    """
+
+    def __init__(self, callback: Union[None, Callable[["RenderStats"], Any]] = None) -> None:
+        self.callback = callback
+        self.timings: Dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.cells = 0
+        self.pattern_hits = 0
+        self.pattern_misses = 0
+        self.wrapped_lines = 0
+        self.lines = 0
+        self.planned_rows = 0
+        self.planned_cells = 0
+
+    def record(self, stage: str, since: float) -> float:
+        """
+        Adds the time from `since` until now to `stage` and returns now, so
+        that the next stage can be timed from it.
+        """
+        now = perf_counter()
+        self.timings[stage] += now - since
+        return now
+
+    def measure(self, lines: Iterator[str]) -> Iterator[str]:
+        """
+        Passes on the lines of a table while timing how long each one takes
+        to produce, leaving out the time the caller spends between lines.
+        Whatever isn't attributed to another stage is spent emitting.
+        """
+        timings = self.timings
+        recorded = sum(timings.values())
+        total = 0.0
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    line = next(lines)
+                except StopIteration:
+                    total += perf_counter() - start
+                    return
+                total += perf_counter() - start
+                self.lines += 1
+                yield line
+        finally:
+            timings["emit"] += max(total - (sum(timings.values()) - recorded), 0.0)
+            if self.callback is not None:
+                self.callback(self)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        The measurements as a flat dictionary, with each stage's time in
+        seconds under `<stage>_seconds`.
+        """
+        out = {f"{stage}_seconds": seconds for stage, seconds in self.timings.items()}
+        out.update(
+            cells=self.cells,
+            pattern_hits=self.pattern_hits,
+            pattern_misses=self.pattern_misses,
+            wrapped_lines=self.wrapped_lines,
+            lines=self.lines,
+            planned_rows=self.planned_rows,
+            planned_cells=self.planned_cells,
+        )
+        return out
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={value!r}" for name, value in self.as_dict().items())
+        return f"RenderStats({fields})"
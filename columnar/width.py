@@ -0,0 +1,279 @@
+"""
+Display-width measurement for table cells.
+
+`wcwidth.wcswidth` walks a string one character at a time, which is the
+right thing to do for wide characters and emojis but is needlessly slow for
+the plain ASCII text that makes up most tables, and wrapping a long line by
+re-measuring ever shorter slices of it is quadratic in the length of the
+line. The helpers here avoid both costs while returning exactly what
+`wcswidth` would. wcwidth and its tables are only imported the first time
+a string that isn't printable ASCII has to be measured.
+"""
+from bisect import bisect_right
+from functools import lru_cache
+from typing import List, Sequence, Tuple, Union
+
+ZERO_WIDTH_JOINER = "\u200d"
+VARIATION_SELECTOR_16 = "\ufe0f"
+
+# "char" splits lines at any character, "word" between words, only splitting
+# words that are wider than their column, and "word-hyphen" also ends each
+# piece of a split word with a hyphen.
+WRAP_MODES = ("char", "word", "word-hyphen")
+
+# Number of distinct non-ASCII strings whose widths are remembered. Columns
+# such as status or region repeat a handful of values over and over again.
+WIDTH_CACHE_SIZE = 4096
+
+
+def is_narrow(text: str) -> bool:
+    """
+    True when every character in `text` is printable ASCII, in which case
+    its display width is simply its length.
+    """
+    return text.isascii() and text.isprintable()
+
+
+@lru_cache(maxsize=WIDTH_CACHE_SIZE)
+def wide_display_width(text: str) -> int:
+    from wcwidth import wcswidth
+
+    return wcswidth(text)
+
+
+def display_width(text: str) -> int:
+    """
+    The number of terminal columns `text` occupies, or -1 if it contains
+    control characters, exactly as `wcwidth.wcswidth` reports it.
+    """
+    if is_narrow(text):
+        return len(text)
+    return wide_display_width(text)
+
+
+@lru_cache(maxsize=256)
+def variation_selector_width(char: str) -> int:
+    # the extra column VS-16 adds when it turns a narrow character into a wide one
+    from wcwidth import wcwidth, wcswidth
+
+    return wcswidth(char + VARIATION_SELECTOR_16) - wcwidth(char)
+
+
+def wrap_line(
+    line: str,
+    width: int,
+    line_width: Union[None, int] = None,
+    max_pieces: Union[None, int] = None,
+) -> List[str]:
+    """
+    Splits a single line of text into pieces that are at most `width`
+    display columns wide. Each piece holds at most `width` characters and
+    the last piece holds whatever is left over. A line containing control
+    characters, whose width can't be measured, is returned unsplit.
+
+    The widths of successive prefixes are accumulated in a single scan over
+    the line, so finding each wrap point costs no more than reading the
+    characters that end up in the piece. If the display width of the line is
+    already known it can be passed as `line_width`. With `max_pieces` the
+    scan stops once that many pieces have been found.
+    """
+    if line_width is None:
+        line_width = display_width(line)
+    if line_width <= width:
+        return [line]
+    # a character wider than the column still has to go somewhere
+    width = max(width, 1)
+    if max_pieces is None:
+        max_pieces = len(line)
+    if is_narrow(line):
+        return [line[i : i + width] for i in range(0, min(len(line), width * max_pieces), width)]
+
+    from wcwidth import wcwidth
+
+    pieces = []
+    start = 0
+    end = len(line)
+    while True:
+        cap = start + width
+        fit = start
+        total = 0
+        last_measured = None
+        skip_next = False
+        idx = start
+        while idx < end:
+            char = line[idx]
+            if skip_next:
+                # the character after a zero width joiner is not measured
+                skip_next = False
+            elif char == ZERO_WIDTH_JOINER:
+                skip_next = True
+            elif char == VARIATION_SELECTOR_16 and last_measured:
+                total += variation_selector_width(last_measured)
+                last_measured = None
+            else:
+                char_width = wcwidth(char)
+                if char_width < 0:
+                    # the rest of the line can't be measured, so it isn't wrapped
+                    pieces.append(line[start:])
+                    return pieces
+                if char_width > 0:
+                    last_measured = char
+                total += char_width
+            idx += 1
+            if total > width:
+                break
+            if idx <= cap:
+                fit = idx
+        else:
+            pieces.append(line[start:])
+            return pieces
+        fit = max(fit, start + 1)
+        pieces.append(line[start:fit])
+        if fit == end or len(pieces) >= max_pieces:
+            return pieces
+        start = fit
+
+
+def cumulative_widths(line: str) -> Union[None, Sequence[int]]:
+    """
+    The display width of every prefix of `line`, from the empty prefix to
+    the whole line, measured in a single scan the same way `wcswidth`
+    measures the line. None if the line contains control characters.
+    """
+    if is_narrow(line):
+        return range(len(line) + 1)
+
+    from wcwidth import wcwidth
+
+    widths = [0]
+    total = 0
+    last_measured = None
+    skip_next = False
+    for char in line:
+        if skip_next:
+            skip_next = False
+        elif char == ZERO_WIDTH_JOINER:
+            skip_next = True
+        elif char == VARIATION_SELECTOR_16 and last_measured:
+            total += variation_selector_width(last_measured)
+            last_measured = None
+        else:
+            char_width = wcwidth(char)
+            if char_width < 0:
+                return None
+            if char_width > 0:
+                last_measured = char
+            total += char_width
+        widths.append(total)
+    return widths
+
+
+def fit_end(line: str, widths: Sequence[int], start: int, width: int, end: int) -> int:
+    """
+    The end of the longest piece starting at `start` that is at most `width`
+    display columns wide and holds at most `width` characters, found by a
+    binary search of the cumulative widths. A piece doesn't end on a zero
+    width joiner or just before a variation selector, which would measure
+    differently apart than they do together, unless nothing shorter fits.
+    """
+    fit = bisect_right(widths, widths[start] + width, start, min(end, start + width) + 1) - 1
+    while start + 1 < fit < end and (
+        line[fit - 1] == ZERO_WIDTH_JOINER or line[fit] == VARIATION_SELECTOR_16
+    ):
+        fit -= 1
+    return fit
+
+
+def wrap_words(
+    line: str,
+    width: int,
+    max_pieces: int,
+    hyphenate: bool,
+    line_width: Union[None, int] = None,
+) -> List[str]:
+    """
+    Splits a line into pieces that are at most `width` display columns wide,
+    breaking it at the last space that fits. The spaces a line is broken at
+    are dropped. A word wider than the column is split where it has to be,
+    with a hyphen at the end of each piece when `hyphenate` is set. A line
+    containing control characters is returned unsplit.
+
+    Breakpoints are found from the cumulative display widths, which are
+    measured once, and no more than `max_pieces` pieces are produced. Each
+    piece holds at most `width` characters besides the space it's broken at,
+    so unless the line has runs of spaces only the part of it that ends up
+    in those pieces is measured.
+    """
+    if line_width is None:
+        line_width = display_width(line)
+    end = len(line)
+    measured = min(end, max_pieces * (width + 1))
+    widths = cumulative_widths(line[:measured])
+    if widths is None or line_width < 0:
+        return [line]
+    pieces: List[str] = []
+    start = 0
+    while start < end and len(pieces) < max_pieces:
+        if start + width >= measured and measured < end:
+            # a run of spaces has carried the line past the part measured
+            measured = end
+            widths = cumulative_widths(line)
+            if widths is None:
+                return [line]
+        if line_width - widths[start] <= width:
+            pieces.append(line[start:])
+            break
+        fit = fit_end(line, widths, start, width, end)
+        stop = fit if line[fit] == " " else line.rfind(" ", start, fit)
+        piece = line[start:stop].rstrip(" ") if stop > start else ""
+        if piece:
+            pieces.append(piece)
+            start = stop
+            while start < end and line[start] == " ":
+                start += 1
+            continue
+        # the word doesn't fit on a line of its own
+        if hyphenate and width > 1:
+            hyphen_fit = fit_end(line, widths, start, width - 1, end)
+            if (
+                hyphen_fit > start
+                and line[hyphen_fit - 1] != ZERO_WIDTH_JOINER
+                and line[hyphen_fit] != VARIATION_SELECTOR_16
+            ):
+                pieces.append(line[start:hyphen_fit] + "-")
+                start = hyphen_fit
+                continue
+        fit = max(fit, start + 1)
+        pieces.append(line[start:fit])
+        start = fit
+    return pieces
+
+
+def wrap_line_widths(
+    line: str,
+    width: int,
+    line_width: Union[None, int] = None,
+    max_pieces: Union[None, int] = None,
+    mode: str = "char",
+) -> Tuple[List[str], List[int]]:
+    """
+    Wraps a line with `wrap_line`, or with `wrap_words` when `mode` is
+    "word" or "word-hyphen", also returning the display width of each piece.
+    The pieces of a printable ASCII line are as wide as they are long, so
+    they are only measured when the line has wide characters.
+    """
+    if line_width is None:
+        line_width = display_width(line)
+    if mode == "char" or line_width <= width:
+        pieces = wrap_line(line, width, line_width, max_pieces)
+    else:
+        pieces = wrap_words(
+            line,
+            max(width, 1),
+            len(line) if max_pieces is None else max_pieces,
+            mode == "word-hyphen",
+            line_width,
+        )
+    if is_narrow(line):
+        return pieces, list(map(len, pieces))
+    return pieces, list(map(display_width, pieces))
@@ -1,8 +1,26 @@
+import os
+
 import setuptools
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
+# `COLUMNAR_COMPILE=mypyc pip install .` compiles the width measurement,
+# wrapping and justification kernels with mypyc, which has to be installed.
+# Without it the same modules are used as plain Python.
+ext_modules = []
+if os.environ.get("COLUMNAR_COMPILE") == "mypyc":
+    from mypyc.build import mypycify
+
+    ext_modules = mypycify(
+        [
+            "--ignore-missing-imports",
+            "--follow-imports=silent",
+            "columnar/width.py",
+            "columnar/kernels.py",
+        ]
+    )
+
 setuptools.setup(
     name="Columnar",
     version="1.4.1",
@@ -12,8 +30,8 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     packages=setuptools.find_packages(),
+    ext_modules=ext_modules,
     install_requires=[
-        'toolz',
         'wcwidth',
     ],
     classifiers=[
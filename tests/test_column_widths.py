@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from columnar import Columnar
+from columnar.exceptions import TableOverflowError
+
+
+def reference_column_widths(renderer, natural_widths, terminal_width):
+    """
+    The shrinking loop `get_column_widths` used before it was rewritten,
+    which re-sums every column each time another column shares the reduction.
+    """
+    def distribute_between(diff, columns, n):
+        width = sum([column["width"] for column in columns[:n]])
+        new_width = (width - diff) // n
+        for i in range(n):
+            columns[i]["width"] = new_width
+        return columns
+
+    def current_table_width(columns):
+        return sum(
+            [len(renderer.column_sep) + column["width"] for column in columns]
+        ) + len(renderer.column_sep)
+
+    def widths_sorted_by(columns, key):
+        return [column["width"] for column in sorted(columns, key=lambda x: x[key])]
+
+    max_widths = [
+        width if renderer.max_column_width == None else min(width, renderer.max_column_width)
+        for width in natural_widths
+    ]
+    columns = sorted(
+        [{"column_no": no, "width": width} for no, width in enumerate(max_widths)],
+        key=lambda x: x["width"],
+        reverse=True,
+    )
+    for column in columns:
+        if column["width"] < renderer.min_column_width:
+            column["width"] = renderer.min_column_width
+        if renderer.max_column_width:
+            if column["width"] > renderer.max_column_width:
+                column["width"] = renderer.max_column_width
+
+    if current_table_width(columns) <= terminal_width:
+        return widths_sorted_by(columns, "column_no")
+
+    for i in range(len(columns)):
+        diff = current_table_width(columns) - terminal_width
+        columns = distribute_between(diff, columns, i + 1)
+        if i < len(columns) - 1 and columns[0]["width"] < columns[i + 1]["width"]:
+            continue
+        elif (
+            columns[0]["width"] >= renderer.min_column_width
+            and current_table_width(columns) <= terminal_width
+        ):
+            return widths_sorted_by(columns, "column_no")
+
+    raise TableOverflowError(
+        "Could not fit table in current terminal, try reducing the number of columns."
+    )
+
+
+def outcome(plan, *args):
+    try:
+        return plan(*args)
+    except TableOverflowError:
+        return "overflow"
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_water_filling_matches_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        renderer = Columnar(
+            min_column_width=rng.choice([0, 1, 3, 5, 10]),
+            max_column_width=rng.choice([None, None, 0, 4, 15, 60]),
+            column_sep=rng.choice(["|", "‖", "  ", ""]),
+            no_borders=rng.random() < 0.2,
+        )
+        num_columns = rng.choice([0, 1, 2, 5, 20, 120])
+        spread = rng.choice([3, 20, 200])
+        natural_widths = [rng.randint(-1, spread) for _ in range(num_columns)]
+        terminal_width = rng.randint(0, 400)
+        assert outcome(renderer.get_column_widths, natural_widths, terminal_width) == outcome(
+            reference_column_widths, renderer, natural_widths, terminal_width
+        )
@@ -1,6 +1,18 @@
+import asyncio
+import importlib
+import io
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
-from columnar import columnar
+from columnar import CellCache, Columnar, LiveTable, RenderStats, columnar
+from columnar.exceptions import TableOverflowError
+
+# the package's `columnar` attribute is the default renderer, not this module
+columnar_module = importlib.import_module("columnar.columnar")
 
 
 def test_minimal_table():
@@ -18,3 +30,551 @@ def test_empty_table_with_header():
     with pytest.raises(TypeError) as exc_info:
         columnar(data=[], headers=["User", "Message", "Zip"])
     assert str(exc_info.value) == "'data' must be a list of lists. Got an empty list"
+
+
+def test_column_widths_use_widest_physical_row():
+    res = columnar([["a", "bb\nbbbbbbb"], ["ccccccc", "d"]], terminal_width=80)
+    assert res == (
+        '|-------|-------|\n'
+        '|a      |bb     |\n'
+        '|       |bbbbbbb|\n'
+        '|-------|-------|\n'
+        '|ccccccc|d      |\n'
+        '|-------|-------|\n'
+    )
+
+
+def test_iter_lines_matches_call():
+    data = [["one", "two"], ["three", "four"]]
+    lines = list(columnar.iter_lines(data, headers=["a", "b"], terminal_width=80))
+    assert all(line.endswith("\n") for line in lines)
+    assert "".join(lines) == columnar(data, headers=["a", "b"], terminal_width=80)
+
+
+def test_write_to_file_like_object():
+    out = io.StringIO()
+    columnar.write(out, [["some string"]], no_borders=True)
+    assert out.getvalue() == columnar([["some string"]], no_borders=True)
+
+
+@pytest.mark.parametrize("buffer_size", [1, 50, 65536])
+def test_render_to_writes_encoded_chunks(buffer_size):
+    data = [["naïve", "日本語"], ["three", "four"]] * 5
+    out = io.BytesIO()
+    columnar.render_to(out, data, ["a", "b"], buffer_size=buffer_size, terminal_width=80)
+    assert out.getvalue() == columnar(data, ["a", "b"], terminal_width=80).encode("utf-8")
+
+
+def test_render_to_file_descriptor(tmp_path):
+    path = tmp_path / "table.txt"
+    with open(path, "wb") as out:
+        columnar.render_to(
+            out.fileno(), [["ünïcode"]] * 3, encoding="utf-16", buffer_size=1, no_borders=True
+        )
+    assert path.read_bytes() == columnar([["ünïcode"]] * 3, no_borders=True).encode("utf-16")
+
+
+def test_sampled_widths_from_generator():
+    rows = (("row", str(i) * 8) for i in range(3))
+    res = columnar(rows, headers=["name", "value"], sample_size=1, terminal_width=80)
+    assert res == (
+        '|-----|--------|\n'
+        '|name |value   |\n'
+        '|==============|\n'
+        '|row  |00000000|\n'
+        '|-----|--------|\n'
+        '|row  |11111111|\n'
+        '|-----|--------|\n'
+        '|row  |22222222|\n'
+        '|-----|--------|\n'
+    )
+
+
+def test_rows_wider_than_sample_are_wrapped():
+    rows = iter([["short"], ["a much longer value"]])
+    res = columnar(rows, sample_size=1, terminal_width=80)
+    assert res == (
+        '|-----|\n'
+        '|short|\n'
+        '|-----|\n'
+        '|a muc|\n'
+        '|h lon|\n'
+        '|ger v|\n'
+        '|alue |\n'
+        '|-----|\n'
+    )
+
+
+def test_caller_supplied_column_widths():
+    rows = iter([["one", "two"], ["three", "four"]])
+    res = columnar(rows, column_widths=[3, 6], terminal_width=80)
+    assert res == (
+        '|---|------|\n'
+        '|one|two   |\n'
+        '|---|------|\n'
+        '|thr|four  |\n'
+        '|ee |      |\n'
+        '|---|------|\n'
+    )
+
+
+def test_reservoir_sample_covering_all_rows_matches_full_plan():
+    data = [["a", "bbbbbbbbb"], ["cccccccc", "d"], ["e", "f"]]
+    res = columnar(data, sample_size=10, sample_strategy="reservoir", terminal_width=80)
+    assert res == columnar(data, terminal_width=80)
+
+
+def test_reservoir_sample_needs_reiterable_data():
+    with pytest.raises(TypeError):
+        columnar(iter([["a"]]), sample_size=1, sample_strategy="reservoir")
+
+
+def test_column_widths_use_display_width_of_wide_characters():
+    res = columnar([["本日のヒーロー", "x"]], terminal_width=80)
+    assert res == (
+        '|--------------|-----|\n'
+        '|本日のヒーロー|x    |\n'
+        '|--------------|-----|\n'
+    )
+
+
+def test_word_wrap_mode_breaks_between_words():
+    data = [["the quick brown fox", "hippopotamus"]]
+    res = columnar(data, max_column_width=8, wrap_max=2, wrap_mode="word-hyphen")
+    assert res == (
+        '|--------|--------|\n'
+        '|the     |hippopo-|\n'
+        '|quick   |tamus   |\n'
+        '|brown   |        |\n'
+        '|--------|--------|\n'
+    )
+    with pytest.raises(ValueError):
+        Columnar(wrap_mode="words")
+
+
+def test_configured_renderer_is_not_changed_by_overrides():
+    renderer = Columnar(no_borders=True, terminal_width=80)
+    bordered = renderer([["some string"]], no_borders=False)
+    assert bordered == '|-----------|\n|some string|\n|-----------|\n'
+    assert renderer([["some string"]]) == '    \n  some string  \n'
+    assert renderer.no_borders
+
+
+def test_concurrent_renders_do_not_interfere():
+    shared = Columnar(justify="r", terminal_width=60)
+    jobs = []
+    for i in range(200):
+        data = [[f"row {i}", "x" * (i % 40), i] for _ in range(i % 7 + 1)]
+        options = [
+            dict(no_borders=bool(i % 2), wrap_max=i % 4, column_sep="|" if i % 3 else "#"),
+            dict(justify="c", patterns=[(r"row", lambda text: text.upper())]),
+        ][i % 2]
+        renderer = columnar if i % 4 < 2 else shared
+        jobs.append((renderer, data, ["name", "fill", "number"], options))
+    expected = [renderer(data, headers, **options) for renderer, data, headers, options in jobs]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        for _ in range(5):
+            results = list(
+                pool.map(lambda job: job[0](job[1], job[2], **job[3]), jobs)
+            )
+            assert results == expected
+
+
+def test_configure_reuses_renderers_with_the_same_options():
+    renderer = columnar.configure(no_borders=True, select=["name"])
+    assert columnar.configure(no_borders=True, select=["name"]) is renderer
+    assert columnar.configure(no_borders=False) is not renderer
+    assert renderer.render([["x"]], ["name"]) == columnar([["x"]], ["name"], no_borders=True, select=["name"])
+
+
+def test_precompiled_patterns_are_accepted():
+    renderer = Columnar(patterns=[(re.compile("some"), str.upper)], terminal_width=80)
+    assert renderer.render([["some string"]]) == '|-----------|\n|SOME STRING|\n|-----------|\n'
+
+
+@pytest.mark.parametrize("no_borders", [False, True])
+def test_parallel_rendering_matches_serial(monkeypatch, no_borders):
+    monkeypatch.setattr(columnar_module, "PARALLEL_CHUNK_SIZE", 7)
+    data = [
+        [i, "\x1b[31mred\x1b[0m" if i % 3 else "本日のヒーロー", "line\n" * (i % 4) + "x" * i]
+        for i in range(50)
+    ]
+    options = dict(
+        justify=["r", "c", "l"],
+        no_borders=no_borders,
+        terminal_width=40,
+        patterns=[(r"\d+$", lambda text: f"#{text}")],
+    )
+    expected = columnar(data, ["id", "color", "text"], **options)
+    assert columnar(data, ["id", "color", "text"], workers=2, **options) == expected
+
+
+def test_parallel_rendering_starts_one_pool_per_table(monkeypatch):
+    import concurrent.futures
+
+    started = []
+
+    class CountingPool(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            started.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", CountingPool)
+    headers = ["id"] + [f"metric{i}" for i in range(11)]
+    data = [[f"host-{row}"] + [f"{row * i}.5" * 3 for i in range(11)] for row in range(9)]
+    options = dict(terminal_width=40, min_column_width=12, paging=True, head=2, tail=2)
+    expected = columnar(data, headers, **options)
+    assert columnar(data, headers, workers=2, **options) == expected
+    assert len(started) == 1
+
+
+def test_cells_are_kept_by_column_until_rendered():
+    renderer = Columnar(terminal_width=80, min_column_width=1)
+    columns = renderer.clean_data([["a", "b\nbb"], ["ccc", 1]])
+    assert columns == [["a", "ccc"], ["b\nbb", "1"]]
+    column_data = renderer.convert_data_to_logical_rows(columns)
+    assert column_data.cells == [[["a"], ["ccc"]], [["b", "bb"], ["1"]]]
+    assert renderer.natural_column_widths(column_data) == [3, 2]
+    assert renderer.render([["a", "b\nbb"], ["ccc", 1]]) == (
+        "|---|--|\n|a  |b |\n|   |bb|\n|---|--|\n|ccc|1 |\n|---|--|\n"
+    )
+
+
+def test_combined_patterns_keep_first_match_priority():
+    patterns = [
+        (re.compile("RUN", re.I), lambda text: "first"),
+        (r"run", lambda text: "second"),
+        (r"(st)op\w*", lambda text: "third"),
+    ]
+    renderer = Columnar(patterns=patterns)
+    assert renderer.pattern_dispatcher is not None
+    assert renderer.apply_patterns("running") == "first"
+    assert renderer.apply_patterns("stopped") == "third"
+    assert renderer.apply_patterns("idle") == "idle"
+
+
+def test_patterns_that_cant_be_combined_are_tried_in_turn():
+    renderer = Columnar(patterns=[(r"(a)\1", lambda text: "double"), (r"a", lambda text: "single")])
+    assert renderer.pattern_dispatcher is None
+    assert renderer.apply_patterns("aab") == "double"
+    assert renderer.apply_patterns("ab") == "single"
+
+
+def test_strip_color_splits_text_and_codes_in_one_pass():
+    renderer = Columnar()
+    assert renderer.strip_color("plain") == ("plain", None)
+    assert renderer.strip_color("\x1b[31mred\x1b[0m") == ("red", "\x1b[31m")
+    assert renderer.strip_color("\x1b[1m\x1b[31mbold red\x1b[0m") == ("bold red", "\x1b[1m\x1b[31m")
+
+
+@pytest.mark.parametrize("options", [
+    dict(terminal_width=30, wrap_max=1),
+    dict(terminal_width=30, wrap_max=1, wrap_mode="word"),
+    dict(terminal_width=60, no_borders=True, justify=["r", "c", "l"]),
+    dict(terminal_width=60, sample_size=3, patterns=[(r"run", lambda text: f"\x1b[32m{text}\x1b[0m")]),
+])
+def test_cell_cache_matches_uncached_output(options):
+    data = [
+        ["running", "本日のヒーロー" * 3, "two\nlines"],
+        ["stopped", "x", "a" * 40],
+        ["running", "本日のヒーロー" * 3, "two\nlines"],
+    ] * 4
+    cache = CellCache(maxsize=4)
+    expected = columnar(data, ["status", "note", "text"], **options)
+    assert columnar(data, ["status", "note", "text"], cell_cache=cache, **options) == expected
+    info = cache.cache_info()
+    assert info.currsize <= 4
+    assert info.hits > 0 and 0 < info.hit_rate < 1
+
+
+def test_cell_cache_is_kept_apart_for_each_renderer():
+    data = [["ok", "x"], ["ok", "y"]]
+    cache = CellCache()
+    assert columnar(data, cell_cache=cache) == columnar(data)
+    options = dict(patterns=[("ok", lambda text: "BAD")])
+    assert columnar(data, cell_cache=cache, **options) == columnar(data, **options)
+    with pytest.raises(TypeError):
+        columnar(data, None, 0)
+
+
+def test_cell_cache_evicts_least_recently_used():
+    cache = CellCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.cache_info() == (1, 1, 2, 2)
+
+
+@pytest.mark.parametrize("options", [
+    dict(terminal_width=50),
+    dict(terminal_width=40, no_borders=True, wrap_max=1),
+    dict(terminal_width=60, select=["c1", "c3"], justify=["r", "c"]),
+])
+def test_live_table_frames_match_full_renders(options):
+    rng = random.Random(1)
+    words = ["a", "bb", "本日", "x" * 30, "line\nline2", "\x1b[31mred\x1b[0m", ""]
+    headers = ["c0", "c1", "c2", "c3"]
+    live = LiveTable(headers, **options)
+    data = [[rng.choice(words) for _ in range(4)] for _ in range(6)]
+    screen = []
+    for _ in range(40):
+        action = rng.random()
+        if action < 0.6:
+            data[rng.randrange(len(data))][rng.randrange(4)] = rng.choice(words)
+        elif action < 0.8:
+            data.append([rng.choice(words) for _ in range(4)])
+        elif len(data) > 1:
+            data.pop(rng.randrange(len(data)))
+        changes = live.update(data)
+        expected = columnar(data, headers, **options)
+        assert live.frame() == expected
+        screen = screen[: live.num_lines] + [None] * (live.num_lines - len(screen))
+        for line_no, line in changes:
+            screen[line_no] = line
+        assert "".join(screen) == expected
+
+
+@pytest.mark.parametrize("option", [
+    dict(drop=["-"]), dict(head=2), dict(tail=2), dict(offset=1), dict(limit=3),
+    dict(paging=True), dict(sample_size=10), dict(workers=2),
+])
+def test_live_table_rejects_unsupported_options(option):
+    with pytest.raises(ValueError):
+        LiveTable(["a"], **option)
+
+
+def test_live_table_waits_for_rows_to_count_columns():
+    live = LiveTable(terminal_width=80)
+    live.update([])
+    live.update([["a", "b"]])
+    assert live.frame() == columnar([["a", "b"]], terminal_width=80)
+    with pytest.raises(ValueError):
+        LiveTable(column_widths=[3]).update([["a", "b"]])
+
+
+def test_live_table_only_reports_changed_lines():
+    live = LiveTable(["name", "cpu"], terminal_width=80)
+    live.update([["init", "0.1"], ["sshd", "0.0"]])
+    assert live.update([["init", "0.1"], ["sshd", "0.0"]]) == []
+    assert live.update([["init", "0.1"], ["sshd", "0.2"]]) == [(5, "|sshd |0.2  |\n")]
+
+
+@pytest.mark.parametrize("options", [dict(), dict(no_borders=True, justify=["r", "c", "l"] * 4)])
+def test_paging_splits_wide_tables_into_tables_that_fit(options):
+    headers = ["id"] + [f"metric{i}" for i in range(11)]
+    data = [[f"host-{row}"] + [f"{row * i}.5" * 3 for i in range(11)] for row in range(3)]
+    with pytest.raises(TableOverflowError):
+        columnar(data, headers, terminal_width=40, min_column_width=12, **options)
+    table = columnar(
+        data, headers, terminal_width=40, min_column_width=12,
+        paging=True, key_columns=["^id$"], **options
+    )
+    pages = table.split("\n\n")
+    assert len(pages) > 1
+    shown = []
+    for page in pages:
+        assert all(len(line) <= 40 for line in page.splitlines())
+        page_headers = re.findall(r"(ID|id|METRIC\d+|metric\d+)", page.splitlines()[1])
+        assert page_headers[0].lower() == "id"
+        shown.extend(page_headers[1:])
+        columns = [headers.index(header.lower()) for header in page_headers]
+        justify = options.get("justify")
+        expected = columnar(
+            [[row[i] for i in columns] for row in data],
+            [headers[i] for i in columns],
+            terminal_width=40,
+            min_column_width=12,
+            **dict(options, **({"justify": [justify[i] for i in columns]} if justify else {})),
+        )
+        assert page + ("" if page.endswith("\n") else "\n") == expected
+    assert [header.lower() for header in shown] == headers[1:]
+
+
+@pytest.mark.parametrize("window", [
+    dict(head=2),
+    dict(tail=2),
+    dict(head=1, tail=2),
+    dict(offset=3),
+    dict(offset=20),
+    dict(offset=3, limit=4),
+    dict(offset=2, limit=6, head=2, tail=1),
+    dict(head=20),
+])
+def test_windows_show_the_same_rows_for_lists_iterators_and_columns(window):
+    data = [[f"r{i}", "本日" * (i % 3), "x" * (i * 3)] for i in range(10)]
+    headers = ["id", "note", "text"]
+    expected_rows = data[window.get("offset", 0):]
+    if "limit" in window:
+        expected_rows = expected_rows[: window["limit"]]
+    head, tail = window.get("head", 0), window.get("tail", 0)
+    if head and tail and head + tail < len(expected_rows):
+        expected_rows = expected_rows[:head] + expected_rows[-tail:]
+    elif head and not tail:
+        expected_rows = expected_rows[:head]
+    elif tail and not head:
+        expected_rows = expected_rows[-tail:]
+
+    table = columnar(data, headers, terminal_width=200, **window)
+    shown = [line.split("|")[1].strip() for line in table.splitlines() if line.startswith("|r")]
+    assert shown == [row[0] for row in expected_rows]
+    assert columnar(iter(data), headers, terminal_width=200, **window) == table
+    columns = {header: [row[i] for row in data] for i, header in enumerate(headers)}
+    assert columnar(columns, terminal_width=200, **window) == table
+
+    full = columnar(data, headers, terminal_width=200)
+    scanned = columnar(data, headers, terminal_width=200, window_widths="all", **window)
+    assert scanned.splitlines()[0] == full.splitlines()[0]
+
+
+def test_elided_rows_are_marked():
+    data = [[i, "ok"] for i in range(100)]
+    table = columnar(data, ["id", "status"], head=1, tail=1, min_column_width=12)
+    assert table.splitlines()[5] == "|   ... 98 more rows ...  |"
+    assert columnar(data, ["id", "status"], head=1, elided_marker=None).count("\n") == 5
+    for rows in (data, iter(data)):
+        lines = columnar(rows, ["id", "status"], tail=2, min_column_width=12).splitlines()
+        assert lines[3] == "|   ... 98 more rows ...  |"
+        assert lines[5].startswith("|98")
+    for rows in (data, iter(data)):
+        lines = columnar(rows, ["id", "status"], offset=3, limit=1, min_column_width=12).splitlines()
+        assert lines[3] == "|   ... 3 more rows ...   |"
+        assert lines[5].startswith("|3 ")
+        assert lines[7] == "|   ... 96 more rows ...  |"
+    table = columnar(data, ["id", "status"], head=1, tail=1, elided_marker="省略 {count} 行")
+    assert table.splitlines()[5] == "| 省略 98 行 |"
+    table = columnar(data, ["id", "status"], head=1, tail=1, elided_marker="省略" * 5 + " {count}")
+    assert table.splitlines()[5] == "|省略省略省略|"
+
+
+class Unprintable:
+    def __str__(self):
+        raise AssertionError("only displayed cells should be converted to strings")
+
+
+@pytest.mark.parametrize("options", [dict(select=["keep"]), dict(select=["keep"], sample_size=1)])
+def test_unselected_columns_are_never_cleaned(options):
+    data = [["a", Unprintable()], ["b", Unprintable()]]
+    table = columnar(data, ["keep", "skip"], **options)
+    assert "skip" not in table and "b" in table
+
+
+def test_drop_stops_checking_a_column_at_its_first_kept_value():
+    data = [["-", "x", "-"], ["-", Unprintable(), "-"]]
+    renderer = Columnar(drop=["-"])
+    assert renderer.columns_to_keep(list(zip(*data)), ["a", "b", "c"], cleaned=False) == [1]
+
+
+@pytest.mark.parametrize("options", [dict(), dict(sample_size=2)])
+def test_render_stats_count_each_stage(options):
+    data = [["apple", "x" * 30], ["banana", "y"], ["ant", "z"]]
+    finished = []
+    stats = RenderStats(callback=finished.append)
+    patterns = [(r"^a", str.upper)]
+    table = columnar(
+        iter(data) if options else data, ["fruit", "note"], patterns=patterns,
+        max_column_width=10, stats=stats, **options
+    )
+    assert table == columnar(
+        data, ["fruit", "note"], patterns=patterns, max_column_width=10, **options
+    )
+    assert finished == [stats]
+    assert (stats.cells, stats.pattern_hits, stats.pattern_misses) == (6, 2, 4)
+    assert stats.wrapped_lines == 1
+    assert stats.lines == table.count("\n")
+    assert stats.planned_rows == options.get("sample_size", 3)
+    assert set(stats.timings) == {"clean", "filter", "convert", "plan", "emit"}
+    assert all(seconds >= 0 for seconds in stats.timings.values())
+    assert stats.as_dict()["cells"] == 6
+
+
+async def async_rows(rows):
+    for row in rows:
+        await asyncio.sleep(0)
+        yield row
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+@pytest.mark.parametrize("options", [dict(), dict(sample_size=3, no_borders=True)])
+def test_render_async_matches_render(threaded, options):
+    data = [[f"row {i}", "x" * (i % 13)] for i in range(50)]
+    expected = columnar(data, ["a", "b"], terminal_width=60, **options)
+
+    async def render():
+        with ThreadPoolExecutor(1) as executor:
+            executor = executor if threaded else None
+            table = await columnar.render_async(
+                data, ["a", "b"], chunk_size=7, executor=executor, terminal_width=60, **options
+            )
+            lines = [
+                line
+                async for line in columnar.aiter_lines(
+                    async_rows(data), ["a", "b"], chunk_size=7, executor=executor,
+                    terminal_width=60, **options
+                )
+            ]
+            return table, "".join(lines)
+
+    assert asyncio.run(render()) == (expected, expected)
+
+
+class Blocking:
+    """
+    A cell that holds up cleaning, which happens on the executor, until it's
+    released.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def __str__(self):
+        self.started.set()
+        self.released.wait(5)
+        return "released"
+
+
+@pytest.mark.parametrize("use_aiter", [False, True])
+def test_cancelling_during_the_first_chunk_raises_cancelled_error(use_aiter):
+    cell = Blocking()
+
+    async def consume():
+        if use_aiter:
+            return [line async for line in columnar.aiter_lines([[cell]])]
+        return await columnar.render_async([[cell]])
+
+    async def render():
+        loop = asyncio.get_running_loop()
+        task = asyncio.create_task(consume())
+        await loop.run_in_executor(None, cell.started.wait, 5)
+        task.cancel()
+        try:
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        finally:
+            cell.released.set()
+
+    asyncio.run(render())
+
+
+def test_aiter_lines_yields_to_the_event_loop():
+    data = [[i, "row"] for i in range(100)]
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(len(ticks))
+            await asyncio.sleep(0)
+
+    async def render():
+        ticker = asyncio.create_task(tick())
+        await asyncio.sleep(0)
+        seen = []
+        async for _ in columnar.aiter_lines(data, chunk_size=10):
+            seen.append(len(ticks))
+        ticker.cancel()
+        return seen
+
+    seen = asyncio.run(render())
+    assert seen[-1] > seen[0]
@@ -0,0 +1,50 @@
+import pytest
+
+from columnar import columnar
+
+
+def test_dict_of_columns_uses_keys_as_headers():
+    res = columnar({"name": ["busybox", "redis"], "id": [1, 2]}, terminal_width=80)
+    assert res == columnar([["busybox", 1], ["redis", 2]], ["name", "id"], terminal_width=80)
+
+
+def test_dict_columns_must_be_the_same_length():
+    with pytest.raises(ValueError):
+        columnar({"name": ["busybox", "redis"], "id": [1]})
+
+
+def test_dataframe_matches_list_of_lists():
+    pandas = pytest.importorskip("pandas")
+    frame = pandas.DataFrame(
+        {
+            "name": ["busybox", "本日のヒーロー", "tab\tseparated"],
+            "count": [1, 2, 3],
+            "load": [0.5, float("nan"), 2.25],
+            "notes": [None, "line\nbreak", "x"],
+        }
+    )
+    for options in [dict(), dict(no_borders=True), dict(drop=["1", "2", "3"], justify="r")]:
+        assert columnar(frame, terminal_width=60, **options) == columnar(
+            frame.values.tolist(), list(frame.columns), terminal_width=60, **options
+        )
+
+
+def test_plain_dataframe_with_patterns():
+    pandas = pytest.importorskip("pandas")
+    frame = pandas.DataFrame({"status": ["running", "stopped"], "host": ["a", "b"]})
+    patterns = [("running", str.upper)]
+    assert columnar(frame, terminal_width=60, patterns=patterns) == columnar(
+        frame.values.tolist(), ["status", "host"], terminal_width=60, patterns=patterns
+    )
+
+
+def test_numpy_array_has_no_headers():
+    numpy = pytest.importorskip("numpy")
+    array = numpy.arange(6).reshape(3, 2)
+    assert columnar(array, terminal_width=60) == columnar(array.tolist(), terminal_width=60)
+
+
+def test_numpy_array_must_be_two_dimensional():
+    numpy = pytest.importorskip("numpy")
+    with pytest.raises(TypeError):
+        columnar(numpy.arange(6))
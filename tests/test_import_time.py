@@ -0,0 +1,47 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# Cumulative time for `import columnar`, in microseconds, as reported by
+# `python -X importtime` once the package's bytecode has been cached. It
+# takes roughly 25ms at the time of writing, the budget leaves room for
+# slower machines.
+IMPORT_TIME_BUDGET_US = 75_000
+LAZY_MODULES = ["wcwidth", "toolz", "shutil", "random", "concurrent.futures"]
+
+
+def run_python(*args, pycache_prefix):
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return subprocess.run(
+        [sys.executable, "-X", f"pycache_prefix={pycache_prefix}", *args],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_import_doesnt_load_optional_modules(tmp_path):
+    result = run_python(
+        "-c",
+        f"import sys, columnar; print([m for m in {LAZY_MODULES!r} if m in sys.modules])",
+        pycache_prefix=tmp_path,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_import_time_budget(tmp_path):
+    # the first import writes the bytecode that the timed import reads
+    run_python("-c", "import columnar", pycache_prefix=tmp_path)
+    timings = []
+    for _ in range(3):
+        result = run_python("-X", "importtime", "-c", "import columnar", pycache_prefix=tmp_path)
+        match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| columnar$", result.stderr, re.M)
+        assert match is not None, result.stderr
+        timings.append(int(match.group(1)))
+    assert min(timings) < IMPORT_TIME_BUDGET_US, f"import columnar took {min(timings)}us"
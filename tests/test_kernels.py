@@ -0,0 +1,104 @@
+"""
+Checks that the kernels in `columnar.width` and `columnar.kernels` behave
+the same as a copy of their source that can only be imported as plain
+Python. When the package has been compiled with mypyc this compares the
+compiled build with the source, otherwise it still exercises the kernels on
+the same corpus.
+"""
+import importlib
+import random
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+from columnar import kernels, width
+
+WRAP_MODES = ["char", "word", "word-hyphen"]
+SOURCE_MODULES = ["width", "kernels"]
+CHARACTERS = (
+    "abc xyz019"
+    "本日のヒーロー周東選手"
+    "😍🦸✨❤"
+    # zero width joiner, variation selector 16 and a combining accent
+    "\u200d\ufe0f\u0301"
+)
+
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory):
+    package = tmp_path_factory.mktemp("source") / "columnar_source"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    for name in SOURCE_MODULES:
+        shutil.copy(Path(width.__file__).parent / f"{name}.py", package / f"{name}.py")
+    sys.path.insert(0, str(package.parent))
+    try:
+        yield {name: importlib.import_module(f"columnar_source.{name}") for name in SOURCE_MODULES}
+    finally:
+        sys.path.remove(str(package.parent))
+        for name in [*SOURCE_MODULES, ""]:
+            sys.modules.pop(f"columnar_source.{name}".rstrip("."), None)
+
+
+def random_line(rng):
+    line = "".join(rng.choice(CHARACTERS) for _ in range(rng.randrange(0, 24)))
+    return line + "\x07" if rng.random() < 0.05 else line
+
+
+def random_logical_row(rng, num_columns):
+    lrow = [
+        [random_line(rng) for _ in range(rng.randrange(1, 4))] for _ in range(num_columns)
+    ]
+    return lrow, [list(map(width.display_width, cell)) for cell in lrow]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_width_kernels_match_source(source, seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        line = random_line(rng)
+        column_width = rng.randrange(1, 12)
+        assert width.display_width(line) == source["width"].display_width(line)
+        assert width.wrap_line(line, column_width) == source["width"].wrap_line(line, column_width)
+        max_pieces = rng.choice([None, 1, 2])
+        mode = rng.choice(WRAP_MODES)
+        assert width.wrap_line_widths(
+            line, column_width, None, max_pieces, mode
+        ) == source["width"].wrap_line_widths(line, column_width, None, max_pieces, mode)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_row_kernels_match_source(source, seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        num_columns = rng.randrange(1, 5)
+        lrow, lrow_widths = random_logical_row(rng, num_columns)
+        column_widths = [rng.randrange(1, 12) for _ in range(num_columns)]
+        max_lines = rng.randrange(1, 6)
+        mode = rng.choice(WRAP_MODES)
+        wrapped = kernels.wrap_logical_row(lrow, column_widths, lrow_widths, max_lines, mode)
+        assert wrapped == source["kernels"].wrap_logical_row(
+            lrow, column_widths, lrow_widths, max_lines, mode
+        )
+
+        alignments = [rng.choice("lcr") for _ in range(num_columns)]
+        colors = [rng.choice([None, "\x1b[31m"]) for _ in range(num_columns)]
+        lines = kernels.join_physical_lines(
+            *wrapped, column_widths, [kernels.JUSTIFIERS[a] for a in alignments],
+            colors, "|", "\x1b[0m",
+        )
+        assert lines == source["kernels"].join_physical_lines(
+            *wrapped, column_widths, [source["kernels"].JUSTIFIERS[a] for a in alignments],
+            colors, "|", "\x1b[0m",
+        )
+
+
+@pytest.mark.parametrize("alignment", ["l", "c", "r"])
+@pytest.mark.parametrize("text_width", [0, 3, 7, 9])
+def test_justifiers_match_source(source, alignment, text_width):
+    text = "x" * text_width
+    assert kernels.JUSTIFIERS[alignment](text, 7, text_width) == source["kernels"].JUSTIFIERS[
+        alignment
+    ](text, 7, text_width)
@@ -0,0 +1,109 @@
+import pytest
+from wcwidth import wcswidth
+
+from columnar.width import display_width, wrap_line, wrap_line_widths
+
+
+def legacy_wrap(line, width):
+    out = []
+    while wcswidth(line) > width:
+        wrap_index = width
+        while wcswidth(line[:wrap_index]) > width:
+            wrap_index -= 1
+        out.append(line[:wrap_index])
+        line = line[wrap_index:]
+    out.append(line)
+    return out
+
+
+LINES = [
+    "",
+    "short",
+    "exactly ten",
+    "a line of plain ascii text that needs several wraps",
+    "本日のヒーロー🦸周東選手✨　#周東佑京　#侍ジャパン",
+    "Fried Dumplings!!!! Yum! 😍😍😍",
+    "family 👨‍👩‍👧 and hearts ❤️❤️",
+    "combining éééééé",
+    "本日の      ヒーロー      周東選手",
+    "bell \x07 characters are not measured",
+]
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_display_width_matches_wcswidth(line):
+    assert display_width(line) == wcswidth(line)
+
+
+@pytest.mark.parametrize("width", [2, 3, 5, 8])
+@pytest.mark.parametrize("line", LINES)
+def test_wrap_line_matches_legacy_loop(line, width):
+    assert wrap_line(line, width) == legacy_wrap(line, width)
+
+
+@pytest.mark.parametrize("width", [2, 3, 5, 8])
+@pytest.mark.parametrize("line", LINES)
+def test_wrap_line_widths_measures_each_piece(line, width):
+    pieces, widths = wrap_line_widths(line, width, display_width(line))
+    assert pieces == legacy_wrap(line, width)
+    assert widths == [display_width(piece) for piece in pieces]
+
+
+def test_wide_character_in_single_column_does_not_hang():
+    assert wrap_line("😍😍", 1) == ["😍", "😍"]
+
+
+@pytest.mark.parametrize("width", [2, 3, 5, 8])
+@pytest.mark.parametrize("line", LINES)
+def test_wrap_line_stops_after_max_pieces(line, width):
+    assert wrap_line(line, width, max_pieces=2) == legacy_wrap(line, width)[:2]
+
+
+def test_word_wrap_breaks_between_words():
+    line = "The quick brown fox jumps over the lazy dog"
+    pieces, widths = wrap_line_widths(line, 10, mode="word")
+    assert pieces == ["The quick", "brown fox", "jumps over", "the lazy", "dog"]
+    assert widths == [9, 9, 10, 8, 3]
+
+
+def test_word_wrap_splits_long_words():
+    line = "supercalifragilistic is long"
+    assert wrap_line_widths(line, 8, mode="word")[0] == ["supercal", "ifragili", "stic is", "long"]
+    assert wrap_line_widths(line, 8, mode="word-hyphen")[0] == [
+        "superca-",
+        "lifragi-",
+        "listic",
+        "is long",
+    ]
+
+
+def test_word_wrap_keeps_leading_indentation():
+    assert wrap_line_widths("   indented text here", 12, mode="word")[0] == [
+        "   indented",
+        "text here",
+    ]
+
+
+@pytest.mark.parametrize("mode", ["word", "word-hyphen"])
+@pytest.mark.parametrize("width", [2, 3, 5, 8])
+@pytest.mark.parametrize("line", LINES)
+def test_word_wrap_fits_and_keeps_the_text(line, width, mode):
+    pieces, widths = wrap_line_widths(line, width, mode=mode)
+    assert widths == [display_width(piece) for piece in pieces]
+    if display_width(line) < 0:
+        assert pieces == [line]
+        return
+    assert all(piece_width <= width for piece_width in widths)
+    if mode == "word":
+        assert "".join(pieces).replace(" ", "") == line.replace(" ", "")
+    assert wrap_line_widths(line, width, max_pieces=2, mode=mode) == (pieces[:2], widths[:2])
+
+
+@pytest.mark.parametrize("mode", ["word", "word-hyphen"])
+@pytest.mark.parametrize("line", ["aaaaa" + " " * 20 + "bbbbbbb", "本日" + " " * 20 + "ヒーロー周東"])
+def test_word_wrap_measures_past_runs_of_spaces(line, mode):
+    pieces, widths = wrap_line_widths(line, 5, max_pieces=2, mode=mode)
+    assert pieces[0] == line.split(" ")[0]
+    assert widths == [display_width(piece) for piece in pieces]
+    assert wrap_line_widths(line, 5, mode=mode)[0][:2] == pieces
+